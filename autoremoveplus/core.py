@@ -43,16 +43,35 @@ from deluge.plugins.pluginbase import CorePluginBase
 import deluge.component as component
 import deluge.configmanager
 from deluge.core.rpcserver import export
+from deluge.event import DelugeEvent
 
-from twisted.internet import reactor, threads
+from twisted.internet import defer, reactor, threads
 from twisted.internet.task import LoopingCall, deferLater
 from twisted.internet.defer import ensureDeferred
 from deluge._libtorrent import lt
+from collections import deque, namedtuple
 import functools
+import itertools
+import math
 import os
 import subprocess
 import time
 
+from .deadlines import DeadlineQueue, MIN_DELAY as DEADLINE_MIN_DELAY, time_to_eligible
+from .freespace import DiskWatcher, FreeSpaceService, GIB, VolumeSpace
+from .history import MetricHistory, change_since
+from .inodes import InodeIndex
+from .matcher import RuleIndex
+from .planner import plan_evictions
+from .reannounce import AnnounceWaiter, RemovalBatcher
+from .rules import NEVER, CompiledRule, RuleError, general_rule
+from .scanplan import PhaseTimer, ScanPlan, Slicer
+from .scanstats import ScanStats
+from .selection import eviction_order, sort_value
+from .snapshot import ScanSnapshot, StatusTable
+from .statestore import IgnoreStore
+from . import offload
+
 log = logging.getLogger(__name__)
 
 
@@ -77,55 +96,66 @@ DEFAULT_PREFS = {
     'min': 0.0,
     'min2': 0.0,
     'hdd_space': -1.0,
+    'hdd_space_per_volume': {},  # {path: GB}; min. free space on the volume holding path, overriding hdd_space
     'use_quota_for_free_space': False,
     'quota_executable': '/usr/bin/quota',
     'interval': 0.5,  # hours
     'sel_func': 'and',
     'force_reannounce_before_remove': False,
     'reannounce_max_wait_sec': 20,
+    'reannounce_concurrency': 10,  # max. torrents being reannounced & removed at once
     'skip_removal_on_reannounce_failure': True,
     'remove': True,
-    'post_removal_sleep_sec': -1.0,
+    'post_removal_sleep_sec': -1.0,  # obsolete; removals are planned against projected free space
+    'free_space_cache_sec': 30.0,  # how long a free space reading is reused for
+    'free_space_projection_sec': 600.0,  # how long freed bytes are projected onto readings that don't reflect them yet
     'enabled': False,
     'tracker_rules': {},
     'label_rules': {},
     'rule_1_enabled': True,
-    'rule_2_enabled': True
+    'rule_2_enabled': True,
+    'status_ingestion': 'torrent',  # torrent|bulk; bulk: keep status table fed by libtorrent state_update_alerts
+    'incremental_scan': False,  # track finished torrents via deluge events instead of walking all torrents every scan
+    'incremental_resync_hours': 24.0,  # full rescan interval in incremental mode; picks up label & tracker edits
+    'prometheus_textfile': False,  # write scan stats to autoremoveplus.prom in config dir after every scan
+    'disk_watch_sec': 10.0,  # how often free space of download locations is sampled; scan is run once below hdd_space. <= 0 disables
+    'disk_watch_cooldown_sec': 60.0,  # min. time between scans triggered by low free space; doubles while it stays low
+    'scheduler': 'interval',  # interval|deadline; deadline: also scan when a kept torrent's time-based rule is expected to become true
+    'eviction_strategy': 'order',  # order|fewest|value; how torrents to remove are picked to free up hdd_space, see planner.py
+    'shared_data_aware': False,  # w/ remove_data, remove torrents sharing files (hardlinks, cross-seeds) only together
+    'history_sample_min': 60.0,  # how often total uploaded of every torrent is sampled, for upload rate metrics. <= 0 disables
+    'history_days': 7.0,  # how far back samples are kept
+    'scan_slice_ms': 50.0,  # scans yield to the reactor (i.e. serve RPCs) after running this long. <= 0 runs them in one go
+    'scan_executor': 'reactor'  # reactor|thread; thread: rank candidates & evaluate their rules in a worker thread, off the reactor
 }
 
 
-def _get_ratio(i_t):
-    return i_t[1].get_ratio()
+def _get_ratio(st, now):
+    return st['ratio']
 
 
-def _time_last_transfer(i_t):
-    (i, t) = i_t
-    try:
-        # time since last transfer (upload/download) in hours
-        time_since_last_transfer = round(t.get_status(['time_since_transfer'], update=True)['time_since_transfer'] / 3600.0, 4)
-    except Exception as e:
-        log.error("Unable to get torrent property: {}".format(e))
+def _time_last_transfer(st, now):
+    time_since_transfer = st.get('time_since_transfer')
+    if time_since_transfer is None:
+        log.error("Unable to get torrent property: time_since_transfer")
         return False
 
-    return time_since_last_transfer
+    # time since last transfer (upload/download) in hours
+    return round(time_since_transfer / 3600.0, 4)
 
 
-def _age_in_days(i_t):
-    now = time.time()
-    added = i_t[1].get_status(['time_added'])['time_added']
+def _age_in_days(st, now):
+    added = st['time_added']
     log.debug("_age_in_days(): Now = {}, added = {}".format(now, added))
     age_in_days = round((now - added) / 86400.0, 4)
     log.debug("_age_in_days(): Returning age: [{} days]".format(age_in_days))
     return age_in_days
 
 
-def _time_since_seen_complete(i_t):
-    (i, t) = i_t
-    now = time.time()
-    try:
-        seen_complete = t.get_status(['last_seen_complete'], update=True)['last_seen_complete']
-    except Exception as e:
-        log.error("Unable to get torrent property: {}".format(e))
+def _time_since_seen_complete(st, now):
+    seen_complete = st.get('last_seen_complete')
+    if seen_complete is None:
+        log.error("Unable to get torrent property: last_seen_complete")
         return False
 
     if not seen_complete: return False  # TODO: is this ok? default value think is 0, which would then cause us to return False
@@ -136,6 +166,32 @@ def _time_since_seen_complete(i_t):
     return time_last_seen_complete
 
 
+def _upload_since(st, now, hours):
+    # note upload_history is served by the plugin, not deluge; see Core.get_upload_history()
+    return change_since(st['upload_history'], st['total_uploaded'], now - hours * 3600.0)
+
+
+# upload metrics are None, i.e. rules comparing them are false, until history
+# covers their whole window:
+def _upload_24h(st, now):
+    uploaded = _upload_since(st, now, 24)[0]
+    if uploaded is None:
+        return None
+    return round(uploaded / GIB, 4)  # GB
+
+
+def _upload_rate_7d(st, now):
+    (uploaded, since) = _upload_since(st, now, 24 * 7)
+    if since is None or since >= now:
+        return None
+    return round(uploaded / (now - since) / 1024.0, 4)  # KiB/s
+
+
+def _manages_space(config):
+    """Returns True if removals depend on free space of any volume"""
+    return config['hdd_space'] >= 0.0 or any(gb >= 0.0 for gb in config['hdd_space_per_volume'].values())
+
+
 def _get_free_space_quota(quota_exe_path):
     if not os.path.isfile(quota_exe_path):
         raise Exception('[{}] not found'.format(quota_exe_path))
@@ -150,36 +206,164 @@ def _get_free_space_quota(quota_exe_path):
     return free  # free quota, in GB
 
 
-def _get_seed_time(i_t):
-    st = round(i_t[1].get_status(['seeding_time'], update=True)['seeding_time'] / 3600.0, 4)
-    log.debug("_get_seed_time(): %s hours", st)
-    return st
+def _get_seed_time(st, now):
+    seed_time = round(st['seeding_time'] / 3600.0, 4)
+    log.debug("_get_seed_time(): %s hours", seed_time)
+    return seed_time
 
 
-# Add key label also to get_remove_rules():
+# Add key label also to get_remove_rules() and its status keys to filter_status_keys:
+# note every filter is called w/ (status, now) where status is the torrent's
+# per-scan snapshot record (see ScanSnapshot), and now is the scan timestamp.
 filter_funcs = {
     'func_ratio': _get_ratio,
-    #'func_added': lambda i_t: round((time.time() - i_t[1].get_status(['time_added'])['time_added']) / 86400.0, 4),
     'func_added': _age_in_days,
     'func_seed_time': _get_seed_time,
-    'func_seeders': lambda i_t: i_t[1].get_status(['total_seeds'], update=True)['total_seeds'],
-    'func_availability': lambda i_t: i_t[1].get_status(['distributed_copies'], update=True)['distributed_copies'],  # above 1, at least 1 peer has a full copy; think this only has meaning when state='Downloading'; when Seeding, it's always 0! see https://forum.deluge-torrent.org/viewtopic.php?p=233084#p233084
+    'func_seeders': lambda st, now: st['total_seeds'],
+    'func_availability': lambda st, now: st['distributed_copies'],  # above 1, at least 1 peer has a full copy; think this only has meaning when state='Downloading'; when Seeding, it's always 0! see https://forum.deluge-torrent.org/viewtopic.php?p=233084#p233084
     'func_time_since_transfer': _time_last_transfer,
     'func_time_seen_complete': _time_since_seen_complete,
-    'func_state': lambda i_t: i_t[1].get_status(['state'], update=True)['state'].lower(),  # [downloading, paused, seeding, error, moving, queued, checking, allocating] (note all lower case!)
-    'func_progress': lambda i_t: i_t[1].get_status(['progress'], update=True)['progress']  # float, 0-100; note it also reports 100 if state = Error; see ~ https://git.deluge-torrent.org/deluge/tree/deluge/core/torrent.py#n972
+    'func_state': lambda st, now: st['state'].lower(),  # [downloading, paused, seeding, error, moving, queued, checking, allocating] (note all lower case!)
+    'func_progress': lambda st, now: st['progress'],  # float, 0-100; note it also reports 100 if state = Error; see ~ https://git.deluge-torrent.org/deluge/tree/deluge/core/torrent.py#n972
+    'func_upload_24h': _upload_24h,  # from sampled history; covers less than 24h if history doesn't reach back that far
+    'func_upload_rate_7d': _upload_rate_7d
 }
 # other potentially useful statuses:
 # - total_done: (taken  directly from libtorrent); total # of bytes of the files(s) that we have; unsure if or how the value changes when torrent state changes from Downloading to {Seeding,Moving...}
 
 
-sel_funcs = {
-    'and': lambda a_b: a_b[0] and a_b[1],
-    'or': lambda a_b: a_b[0] or a_b[1],
-    'xor': lambda a_b: (not a_b[0]) ^ (not a_b[1])
+# per-second growth of time-based filters' values given the status record, as
+# long as torrent stays in its current state; used by the deadline scheduler:
+filter_rates = {
+    'func_added': lambda st: 1 / 86400.0,
+    'func_seed_time': lambda st: 1 / 3600.0 if st.get('state') == 'Seeding' else 0.0,
+    'func_time_since_transfer': lambda st: 1 / 3600.0,
+    'func_time_seen_complete': lambda st: 1 / 3600.0 if st.get('last_seen_complete') else 0.0
+}
+
+
+# relative cost of computing each of filter_funcs; rules evaluate and/or operands
+# cheapest first, so costly metrics are only computed where they can still change
+# the outcome. Note their status keys are still fetched w/ the rest of the
+# snapshot record, as a second get_status() call costs more than a few extra keys:
+filter_costs = {
+    'func_ratio': 1,
+    'func_added': 1,
+    'func_seed_time': 1,
+    'func_state': 1,
+    'func_progress': 1,
+    'func_time_since_transfer': 2,
+    'func_seeders': 10,  # scrape/peer data
+    'func_availability': 10,  # computed from peers' pieces
+    'func_time_seen_complete': 10,  # peer data
+    'func_upload_24h': 2,
+    'func_upload_rate_7d': 2
+}
+
+# torrents confirmed for removal are removed in batches of at most this many, or
+# once the first of a batch has waited this long for the rest to be reannounced:
+REMOVE_BATCH_MAX = 50
+REMOVE_BATCH_SEC = 5.0
+
+# w/ scan_executor = thread, rules are decided for this many
+# candidates at first, doubling up to DECIDE_CHUNK_MAX each time the walk needs more:
+DECIDE_CHUNK = 256
+DECIDE_CHUNK_MAX = 16384
+
+
+# torrent status keys each of filter_funcs reads from the snapshot record:
+filter_status_keys = {
+    'func_ratio': ['ratio'],
+    'func_added': ['time_added'],
+    'func_seed_time': ['seeding_time'],
+    'func_seeders': ['total_seeds'],
+    'func_availability': ['distributed_copies'],
+    'func_time_since_transfer': ['time_since_transfer'],
+    'func_time_seen_complete': ['last_seen_complete'],
+    'func_state': ['state'],
+    'func_progress': ['progress'],
+    'func_upload_24h': ['total_uploaded', 'upload_history'],
+    'func_upload_rate_7d': ['total_uploaded', 'upload_history']
+}
+# status keys served by the plugin instead of deluge's get_status(): key -> Core method name
+plugin_status_keys = {
+    'upload_history': 'get_upload_history'
 }
 
 
+def _get_status_keys(func_names):
+    """Returns union of status keys needed to evaluate given filters"""
+    keys = {'name'}  # always logged
+    for f in func_names:
+        keys.update(filter_status_keys.get(f, filter_status_keys['func_ratio']))
+    return sorted(keys)
+
+
+# rules compiled from a config: general remove rule, and RuleIndex of
+# exemptions & tracker/label rules:
+ScanRules = namedtuple('ScanRules', ['general', 'index'])
+
+
+class LabelMap(object):
+    """Torrent labels for the duration of a single scan, keyed by torrent id.
+
+    Either backed by a {torrent id: label} dict read in bulk, or if that's not
+    available, by a per-torrent fetch function whose results are memoized."""
+
+    def __init__(self, labels=None, fetch=None):
+        self._labels = {} if labels is None else labels
+        self._fetch = fetch
+        self._cache = {}
+
+    def get(self, tid):
+        """Returns tuple of torrent's labels"""
+        try:
+            return self._cache[tid]
+        except KeyError:
+            pass
+
+        if self._fetch is None:
+            lbl = self._labels.get(tid)
+        else:
+            lbl = self._fetch(tid)
+
+        # TODO: mherz' tote94 fix sets default to ["none"] as opposed to empty arr - why, do we want that?  to be able to create rules for 'none' label?
+        labels = self._cache[tid] = (lbl,) if type(lbl) is str and lbl else ()
+        return labels
+
+
+def compile_rules(config, metrics):
+    try:
+        general = general_rule(config, metrics)
+    except (RuleError, ValueError) as e:
+        # rather not remove anything than remove by a rule we don't understand:
+        log.error("compile_rules(): invalid general rule: %s; no torrents will be removed by it", e)
+        general = NEVER
+    return ScanRules(
+        CompiledRule(general, filter_costs),
+        RuleIndex(
+            config['trackers'],
+            config['labels'],
+            config['tracker_rules'],
+            config['label_rules'],
+            metrics,
+            filter_costs
+        )
+    )
+
+
+class AutoRemovePlusIgnoreEvent(DelugeEvent):
+    """Emitted when ignore (exempt) state of torrents is set; lets UIs keep
+    their own copy of it instead of asking for it via get_ignore()"""
+
+    def __init__(self, torrent_ids, ignore):
+        """
+        :param torrent_ids: list of torrent ids
+        :param ignore: bool, new ignore state of all of them
+        """
+        self._args = [torrent_ids, ignore]
+
+
 class Core(CorePluginBase):
 
     def enable(self):
@@ -189,14 +373,11 @@ class Core(CorePluginBase):
             "autoremoveplus.conf",
             DEFAULT_PREFS
         )
-        self.torrent_states = deluge.configmanager.ConfigManager(
-            "autoremoveplusstates.conf",
-            {}
-        )
+        self.ignore_store = IgnoreStore(deluge.configmanager.get_config_dir("autoremoveplusstates.db"))
+        self.migrate_torrent_states()
 
         # Safe after loading to have a default configuration if no gtkui
         self.config.save()
-        self.torrent_states.save()
 
         # it appears that if the plugin is enabled on boot then it is called
         # before the torrents are properly loaded and so periodic_scan() receives an
@@ -206,24 +387,286 @@ class Core(CorePluginBase):
         self.looping_call = LoopingCall(self.periodic_scan)
         deferLater(reactor, 5, self.start_looping)
         self.torrentmanager = component.get("TorrentManager")
+        self.clock = time.time  # scan time source; replaceable, e.g. by benchmarks/
+
+        self.status_table = StatusTable()
+        self.free_space = FreeSpaceService(self.read_free_space)  # default volume, or quota
+        self.volumes = VolumeSpace(self.free_space)
+        self.announce_waiter = AnnounceWaiter()
+        self.scan_stats = ScanStats()
+        self.scan_running = False
+        self.disk_watcher = DiskWatcher(self.on_disk_pressure, self.get_path_watermark)
+        self.deadlines = DeadlineQueue()
+        self.deadline_call = None
+        self.inodes = InodeIndex()
+        self.history = None
+        self.history_call = LoopingCall(self.sample_history)
+
+        # finished torrents tracked in incremental mode; torrent id -> exempt
+        # flag, where None means exemption is yet to be resolved:
+        self.candidates = {}
+        self.candidates_synced = 0  # time of last full rescan
+        self.candidates_labels_enabled = None
+        # bumped whenever exemptions may have changed; scans that resolved them
+        # under an older generation don't store their results:
+        self.candidates_generation = 0
+
+        self.compile_config()
+        self.alert_handlers = [
+            ("state_update_alert", self.on_alert_state_update),
+            ("tracker_reply_alert", self.announce_waiter.on_tracker_reply),
+            ("tracker_error_alert", self.announce_waiter.on_tracker_error)
+        ]
+        for alert, handler in self.alert_handlers:
+            component.get("AlertManager").register_handler(alert, handler)
+
+        self.event_handlers = [
+            ("TorrentAddedEvent", self.on_torrent_added),
+            ("TorrentFinishedEvent", self.on_torrent_finished),
+            ("TorrentRemovedEvent", self.on_torrent_removed),
+            ("SessionStartedEvent", self.on_session_started),
+            ("TorrentStateChangedEvent", self.on_torrent_state_changed)
+        ]
+        for event, handler in self.event_handlers:
+            component.get("EventManager").register_event_handler(event, handler)
+
+        # served along w/ other torrent status, e.g. to UIs' torrent lists:
+        component.get("CorePluginManager").register_status_field("autoremoveplus_ignored",
+                                                                  self.ignore_store.is_ignored)
 
     def disable(self):
         if self.looping_call.running:
             self.looping_call.stop()
+        self.disk_watcher.stop()
+        if self.deadline_call is not None and self.deadline_call.active():
+            self.deadline_call.cancel()
+        if self.history_call.running:
+            self.history_call.stop()
+        if self.history is not None:
+            self.history.close()
+
+        for alert, handler in self.alert_handlers:
+            component.get("AlertManager").deregister_handler(handler)
+        for event, handler in self.event_handlers:
+            component.get("EventManager").deregister_event_handler(event, handler)
+        component.get("CorePluginManager").deregister_status_field("autoremoveplus_ignored")
+
+        self.ignore_store.close()
 
     def update(self):
         pass
 
+    def migrate_torrent_states(self):
+        """Imports ignore states from autoremoveplusstates.conf used by previous
+        versions into ignore_store, and renames the old file."""
+        states_file = deluge.configmanager.get_config_dir("autoremoveplusstates.conf")
+        if not os.path.isfile(states_file):
+            return
+
+        states = deluge.configmanager.ConfigManager("autoremoveplusstates.conf", {})
+        ignored = [t for t, ignore in states.config.items() if ignore]
+        log.info("migrating %d ignored torrents from %s", len(ignored), states_file)
+        self.ignore_store.set(ignored, True)
+        self.ignore_store.flush()
+        os.rename(states_file, states_file + ".migrated")
+
     def start_looping(self):
         log.info('check interval loop starting')
         self.looping_call.start(self.config['interval'] * 3600.0)
 
+    def on_alert_state_update(self, alert):
+        """Marks torrents reported as changed by libtorrent's state_update_alert
+        so the status table re-reads them on next scan."""
+        if self.config['status_ingestion'] != 'bulk':
+            return
+        self.status_table.mark_changed(str(t_status.info_hash) for t_status in alert.status)
+
+    def track_candidate(self, torrent_id):
+        """(Re)evaluates whether torrent belongs to the incremental candidate set"""
+        if not self.config['incremental_scan']:
+            return
+
+        t = self.torrentmanager.torrents.get(torrent_id)
+        try:
+            finished = t.is_finished
+        except Exception as e:
+            log.warning("track_candidate(): Cannot obtain torrent [%s] 'is_finished' attribute: %s", torrent_id, e)
+            finished = False
+
+        if finished:
+            self.candidates[torrent_id] = None  # exemption resolved on next scan
+        else:
+            self.candidates.pop(torrent_id, None)
+
+    def on_torrent_added(self, torrent_id, from_state):
+        self.track_candidate(torrent_id)
+
+    def on_torrent_finished(self, torrent_id):
+        self.track_candidate(torrent_id)
+
+    def on_torrent_state_changed(self, torrent_id, state):
+        if torrent_id in self.candidates or state == 'Seeding':
+            self.track_candidate(torrent_id)
+
+    def on_torrent_removed(self, torrent_id):
+        self.status_table.discard(torrent_id)
+        self.rules.index.discard(torrent_id)
+        self.candidates.pop(torrent_id, None)
+        self.ignore_store.discard(torrent_id)
+        self.deadlines.discard(torrent_id)
+        self.inodes.discard(torrent_id)
+        if self.history is not None:
+            self.history.discard(torrent_id)
+
+    def on_session_started(self):
+        # all torrents are loaded by now; forget ones removed while we weren't running:
+        self.ignore_store.retain(self.torrentmanager.torrents)
+        if self.history is not None:
+            self.history.retain(self.torrentmanager.torrents)
+        self.update_watched_locations()
+
+    async def refresh_status_table(self, keys):
+        self.status_table.set_keys(keys)
+        # have TorrentManager call post_torrent_updates() for us; note we can't post
+        # it ourselves, as TorrentManager expects every state_update_alert to be
+        # a response to one of its own requests:
+        await self.torrentmanager.torrents_status_update([], [])
+        # our state_update_alert handler is called after TorrentManager's one; let it run:
+        await deferLater(reactor, 0, lambda: None)
+
+    def compile_config(self):
+        """(Re)builds config-derived lookup structures; needs to be called
+        whenever config changes."""
+        # exemptions need to be re-resolved, or if incremental mode was
+        # toggled, candidates rebuilt from scratch:
+        self.candidates = {}
+        self.candidates_synced = 0
+        self.candidates_generation += 1
+
+        self.free_space.ttl = self.config['free_space_cache_sec']
+        self.free_space.pending_ttl = self.config['free_space_projection_sec']
+        self.volumes.reset()
+
+        self.rules = compile_rules(self.config, self.get_remove_rules())
+
+        # statvfs() doesn't know about user quotas:
+        if (self.config['enabled'] and _manages_space(self.config) and
+                not self.config['use_quota_for_free_space']):
+            self.disk_watcher.cooldown = self.config['disk_watch_cooldown_sec']
+            self.disk_watcher.max_cooldown = max(self.disk_watcher.cooldown, self.config['interval'] * 3600.0)
+            self.update_watched_locations()
+            self.disk_watcher.start(self.config['disk_watch_sec'])
+        else:
+            self.disk_watcher.stop()
+
+        self.configure_history()
+
+    def configure_history(self):
+        """Opens upload history w/ enough slots for history_days worth of samples,
+        and (re)starts sampling, or stops it if disabled or no rule reads it"""
+        sample_sec = self.config['history_sample_min'] * 60.0
+        needed = any('upload_history' in filter_status_keys.get(m, ())
+                     for m in self.rules.general.metrics | self.rules.index.metrics)
+        if not needed:
+            sample_sec = 0
+        if self.history_call.running and (sample_sec <= 0 or self.history_call.interval != sample_sec):
+            self.history_call.stop()
+        if sample_sec <= 0:
+            if self.history is not None:
+                self.history.close()
+                self.history = None
+            return
+
+        slots = int(math.ceil(self.config['history_days'] * 86400.0 / sample_sec)) + 1
+        if self.history is None or self.history.slots != slots:
+            if self.history is not None:
+                self.history.close()
+            try:
+                self.history = MetricHistory(deluge.configmanager.get_config_dir("autoremoveplushistory.mmap"), slots)
+            except (OSError, ValueError) as e:
+                log.error("configure_history(): cannot open upload history: %s", e)
+                self.history = None
+                return
+
+        if not self.history_call.running:
+            self.history_call.start(sample_sec, now=False)
+
+    @ensure_deferred
+    async def sample_history(self):
+        # torrents are walked in time slices, same as in scans, so sampling
+        # large sessions doesn't hold up the reactor:
+        slicer = Slicer(self.config['scan_slice_ms'] / 1000.0, PhaseTimer())
+        now = self.clock()
+        values = {}
+        for tid, t in list(self.torrentmanager.torrents.items()):
+            if slicer.due():
+                await slicer.pause()
+            try:
+                values[tid] = t.get_status(['total_uploaded'])['total_uploaded']
+            except Exception as e:
+                log.debug("sample_history(): cannot get total_uploaded of [%s]: %s", tid, e)
+
+        if self.history is None:
+            return  # sampling was disabled in the meantime
+        if slicer.slices > 1:
+            # don't record torrents removed while paused:
+            present = self.torrentmanager.torrents
+            values = dict((tid, v) for tid, v in values.items() if tid in present)
+        self.history.sample(values, now)
+        log.debug("sample_history(): sampled %d torrents in %d slices", len(values), slicer.slices)
+
+    def get_upload_history(self, tid):
+        """Returns torrent's sampled total_uploaded as [(timestamp, bytes), ...], newest first"""
+        return self.history.samples(tid) if self.history is not None else []
+
+    def get_download_locations(self):
+        """Returns set of directories torrents are downloaded or moved to"""
+        core = component.get("Core")
+        locations = {core.get_config_value('download_location')}
+        if core.get_config_value('move_completed'):
+            locations.add(core.get_config_value('move_completed_path'))
+        for t in self.torrentmanager.torrents.values():
+            try:
+                locations.add(t.options['download_location'])
+                if t.options['move_completed']:
+                    locations.add(t.options['move_completed_path'])
+            except Exception:
+                pass
+        return locations
+
+    def update_watched_locations(self):
+        try:
+            self.disk_watcher.set_paths(self.get_download_locations())
+        except Exception as e:
+            log.warning("update_watched_locations(): Problems listing download locations: %s", e)
+
+    def on_disk_pressure(self):
+        self.volumes.invalidate()
+        self.periodic_scan()
+
+    def get_watermarks(self, config):
+        """Returns function mapping Volume key to min. free space required on that
+        volume, in GB"""
+        per_volume = self.volumes.watermarks(config['hdd_space_per_volume'])
+        default = config['hdd_space']
+        return lambda key: per_volume.get(key, default)
+
+    def get_path_watermark(self, path):
+        return self.get_watermarks(self.config)(self.volumes.device(path))
+
+    def get_volume(self, save_path, config):
+        """Returns Volume given torrent save path resides on"""
+        if config['use_quota_for_free_space']:
+            return self.volumes.default  # quota applies to all volumes as a whole
+        return self.volumes.volume(save_path)
+
     @export
     def set_config(self, config):
         """Sets the config dictionary"""
         for key in list(config.keys()):
             self.config[key] = config[key]
         self.config.save()
+        self.compile_config()
         if self.looping_call.running:
             self.looping_call.stop()
         self.looping_call.start(self.config['interval'] * 3600.0)
@@ -233,6 +676,12 @@ class Core(CorePluginBase):
         """Returns the config dictionary"""
         return self.config.config
 
+    @export
+    def get_scan_stats(self):
+        """Returns counters & per-phase timings of the last scan, recent scans and
+        all scans since plugin was enabled"""
+        return self.scan_stats.to_dict()
+
     @export
     def get_remove_rules(self):
         return {
@@ -244,7 +693,9 @@ class Core(CorePluginBase):
             'func_time_since_transfer': 'Time since transfer (h)',
             'func_time_seen_complete': 'Time since seen complete (h)',
             'func_state': 'Torrent state',
-            'func_progress': 'Torrent progress (0-100)'
+            'func_progress': 'Torrent progress (0-100)',
+            'func_upload_24h': 'Uploaded in last 24h (GB)',
+            'func_upload_rate_7d': 'Avg. upload rate, 7 days (KiB/s)'
         }
 
     @export
@@ -252,7 +703,7 @@ class Core(CorePluginBase):
         if not hasattr(torrent_ids, '__iter__'):
             torrent_ids = [torrent_ids]
 
-        return [self.torrent_states.config.get(t, False) for t in torrent_ids]
+        return self.ignore_store.get(torrent_ids)
 
     @export
     def set_ignore(self, torrent_ids, ignore=True):
@@ -264,29 +715,36 @@ class Core(CorePluginBase):
         if not hasattr(torrent_ids, '__iter__'):
             torrent_ids = [torrent_ids]
 
+        torrent_ids = list(torrent_ids)
+        self.ignore_store.set(torrent_ids, ignore)
+        self.candidates_generation += 1
         for t in torrent_ids:
-            self.torrent_states[t] = ignore
+            if t in self.candidates:
+                self.candidates[t] = None
+            self.deadlines.discard(t)
+        component.get("EventManager").emit(AutoRemovePlusIgnoreEvent(torrent_ids, bool(ignore)))
 
-        self.torrent_states.save()
+    def read_free_space(self):
+        """Measures free space, in GB"""
+        if self.config['use_quota_for_free_space']:
+            try:
+                return _get_free_space_quota(self.config['quota_executable'])
+            except Exception as e:
+                log.warning("read_free_space(): _get_free_space_quota() threw up: %s", e)
 
-    def check_min_space(self):
-        min_hdd_space = self.config['hdd_space']  # in GB
+        return component.get("Core").get_free_space() / GIB  # bytes -> GB
+
+    def check_min_space(self, volume, min_hdd_space, planned_gb=0.0):
+        """Returns True if there's enough free space on volume; planned_gb is space
+        that's about to be freed up on it by removals not yet carried out."""
         # if deactivated delete torrents regardless of remaining free drive space:
         if min_hdd_space < 0.0:
             return False
 
-        real_free_space = None
-        if self.config['use_quota_for_free_space']:
-            try:
-                real_free_space = _get_free_space_quota(self.config['quota_executable'])
-            except Exception as e:
-                real_free_space = None
-                log.warning("check_min_space(): _get_free_space_quota() threw up: %s", e)
-
-        if real_free_space is None:
-            real_free_space = component.get("Core").get_free_space() / 1073741824.0  # bytes -> GB
+        # note this is the cached reading plus whatever we've removed since:
+        real_free_space = volume.space.free() + planned_gb
 
-        log.debug("Free Space in GB (real/min.required): %s/%s" % (real_free_space, min_hdd_space))
+        log.debug("Free Space in GB on [%s] (real/min.required): %s/%s" % (volume.path or 'default volume', real_free_space, min_hdd_space))
 
         # if hdd space below minimum delete torrents
         if real_free_space > min_hdd_space:
@@ -302,236 +760,363 @@ class Core(CorePluginBase):
             log.warning(
                     "Problems pausing torrent: [%s]: %s", torrent.torrent_id, e
             )
+            return False
+        return True
 
-    # note: great hint on libtorrent force_announce inner-workings is at https://forum.deluge-torrent.org/viewtopic.php?p=230210#p230210
-    def reannounce(self, tid, t, force_announce):
+    def issue_reannounce(self, tid, t, force_announce):
         # note the first two announce_* arg values are the defaults from https://libtorrent.org/reference-Torrent_Handle.html#force_reannounce()
         announce_seconds = 0    # how many seconds from now to issue the tracker announces; default = 0
         announce_trkr_idx = -1  # specifies which tracker to re-announce. If set to -1 (which is the default), all trackers are re-announced.
         announce_flags = lt.reannounce_flags_t.ignore_min_interval  # announce NOW; as discussed in https://github.com/arvidn/libtorrent/discussions/7334
 
+        if force_announce:
+            try:
+                t.handle.force_reannounce(announce_seconds, announce_trkr_idx, announce_flags)  # note libtorrent's force_reannounce() returntype is void
+                log.debug("issue_reannounce(): forced reannounce issued for torrent [%s]", tid)
+                return True
+            except Exception as e:
+                log.warning("issue_reannounce(): Problems calling libtorrent.torr.force_reannounce(): %s", e)
+        else:
+            if t.force_reannounce():  # this one uses Deluge torrent function, as opposed to directly calling libtorrent's
+                log.debug("issue_reannounce(): non-forced reannounce issued for torrent [%s]", tid)
+                return True
+            else:
+                log.warning("issue_reannounce(): non-forced reannouncing failed for torrent: [%s]", tid)
+        return False
+
+    # note: great hint on libtorrent force_announce inner-workings is at https://forum.deluge-torrent.org/viewtopic.php?p=230210#p230210
+    @ensure_deferred
+    async def reannounce(self, tid, t, force_announce):
+        """Reannounces torrent; forced announces are confirmed by waiting until a tracker
+        has replied to it, as reported by libtorrent's tracker alerts. Returns False
+        if it couldn't be issued, or no tracker replied, within reannounce_max_wait_sec"""
         t_end = time.time() + self.config['reannounce_max_wait_sec']
         while time.time() < t_end:
-            if force_announce:
-                try:
-                    t.handle.force_reannounce(announce_seconds, announce_trkr_idx, announce_flags)  # note libtorrent's force_reannounce() returntype is void
-                    log.debug("reannounce(): forced reannounce OK for torrent [%s]", tid)
+            if not force_announce:
+                # libtorrent holds non-forced announces back until the trackers'
+                # min_interval has passed, usually well past our timeout, so
+                # there's no reply to wait for; issuing it is all we can confirm:
+                if self.issue_reannounce(tid, t, force_announce):
                     return True
-                except Exception as e:
-                    log.warning("reannounce(): Problems calling libtorrent.torr.force_reannounce(): %s", e)
             else:
-                if t.force_reannounce():  # this one uses Deluge torrent function, as opposed to directly calling libtorrent's
-                    log.debug("reannounce(): non-forced reannounce OK for torrent [%s]", tid)
-                    return True
-                else:
-                    log.warning("reannounce(): non-forced reannouncing failed for torrent: [%s]", tid)
-            time.sleep(5)  # TODO: make this configureable?
+                try:
+                    trackers = len(t.trackers)
+                except Exception:
+                    trackers = 1
+                # start waiting prior to announcing, so we can't miss the reply:
+                replied = self.announce_waiter.wait(tid, trackers, max(t_end - time.time(), 0))
+                if self.issue_reannounce(tid, t, force_announce):
+                    if await replied:
+                        log.debug("reannounce(): tracker replied for torrent [%s]", tid)
+                        return True
+                    break
+                self.announce_waiter.cancel(tid)
+
+            await deferLater(reactor, min(5, max(t_end - time.time(), 0)), lambda: None)  # TODO: make this configureable?
 
         log.error("reannounce(): Problems reannouncing for torrent: [%s]; giving up", tid)
         return False
 
-
-    def remove_torrent(self, tid, torrent, remove_data):
-        # extra logging for debugging premature torrent removal issues: {
-        # seed_time = torrent.get_status(['seeding_time'], update=True)['seeding_time']
-        # seed_time_h = _get_seed_time((tid, torrent))
-        # log.error("remove_torrent(): pre-announce seed_time: [%s], h: [%s]", seed_time, seed_time_h)
-        # }
-
+    @ensure_deferred
+    async def reannounce_before_removal(self, tid, torrent, plan):
+        """Reannounces torrent prior to its removal; returns False if it should be
+        spared from removal, as its tracker might not have been updated"""
         force_announce = self.config['force_reannounce_before_remove']
 
         # update trackers to make sure the latest upload amount & time are reflected
         # prior to nuking torrent.
         #
         # TODO: maybe reannounce should also be called on torrent completion event, not only prior to removal?
-        if self.reannounce(tid, torrent, force_announce):
-            time.sleep(2)  # not sure if needed, but let's give some time for the tracker
-        else:
+        try:
+            reannounced = await self.reannounce(tid, torrent, force_announce)
+        except Exception as e:
+            # spare it, but don't fail the rest of the batch:
+            self.announce_waiter.cancel(tid)
+            plan.counts['reannounce_failures'] += 1
+            log.error("reannounce_before_removal(): reannouncing torrent [%s] raised: %s; skipping remove", tid, e)
+            return False
+
+        if not reannounced:
+            plan.counts['reannounce_failures'] += 1
             if self.config['skip_removal_on_reannounce_failure']:
                 log.warning(
-                    "remove_torrent(): reannounce (force = %s) failed for torrent: [%s]; skipping remove", force_announce, tid)
+                    "reannounce_before_removal(): reannounce (force = %s) failed for torrent: [%s]; skipping remove", force_announce, tid)
                 return False
             else:
                 log.warning(
-                    "remove_torrent(): reannounce (force = %s) failed for torrent: [%s]; removing regardless...", force_announce, tid)
-
-        try:
-            seed_time = torrent.get_status(['seeding_time'], update=True)['seeding_time']
-            seed_time_h = _get_seed_time((tid, torrent))
-            total_time_uploaded = torrent.get_status(['total_uploaded'], update=True)['total_uploaded']  # in deluge's internal status, it's under status.all_time_upload
-            total_time_downloaded = torrent.get_status(['all_time_download'], update=True)['all_time_download']
-            age_sec = time.time() - torrent.get_status(['time_added'])['time_added']
-            # note these 2 total_time_* are in bytes, not time values:
-            total_time_uploaded = torrent.get_status(['total_uploaded'], update=True)['total_uploaded']  # in deluge's internal status, it's under status.all_time_upload
-            total_time_downloaded = torrent.get_status(['all_time_download'], update=True)['all_time_download']
+                    "reannounce_before_removal(): reannounce (force = %s) failed for torrent: [%s]; removing regardless...", force_announce, tid)
 
-            log.debug("remove_torrent(): removing torrent [%s]... remove_data = %s, seed_time: [%s], h: [%s], ratio: %s, age_sec: [%s], total_time_up: [%s], total_time_down: [%s]",
-                      tid, remove_data, seed_time, seed_time_h, torrent.get_ratio(), age_sec, total_time_uploaded, total_time_downloaded)
+        return True
 
-            self.torrentmanager.remove(tid, remove_data=remove_data)
+    @ensure_deferred
+    async def remove_torrents(self, torrents, remove_data, plan):
+        """Removes [(id, torrent), ...] w/ a single Core.remove_torrents() call, so
+        Deluge saves its session state once per batch instead of after every torrent"""
+        sizes = {}
+        for tid, torrent in torrents:
+            try:
+                st = torrent.get_status(['seeding_time', 'ratio', 'time_added', 'total_uploaded', 'all_time_download', 'total_done'], update=True)
+                seed_time = st['seeding_time']
+                seed_time_h = _get_seed_time(st, time.time())
+                age_sec = time.time() - st['time_added']
+                # note these 2 total_time_* are in bytes, not time values:
+                total_time_uploaded = st['total_uploaded']  # in deluge's internal status, it's under status.all_time_upload
+                total_time_downloaded = st['all_time_download']
+
+                log.debug("remove_torrents(): removing torrent [%s]... remove_data = %s, seed_time: [%s], h: [%s], ratio: %s, age_sec: [%s], total_time_up: [%s], total_time_down: [%s]",
+                          tid, remove_data, seed_time, seed_time_h, st['ratio'], age_sec, total_time_uploaded, total_time_downloaded)
+                sizes[tid] = st['total_done']
+            except Exception as e:
+                log.warning("remove_torrents(): Problems removing torrent [%s]: %s", tid, e)
+                plan.counts['remove_failures'] += 1
 
-            log.debug("remove_torrent(): successfully removed torrent: [%s]", tid)
-        except Exception as e:
-            log.warning("remove_torrent(): Problems removing torrent [%s]: %s", tid, e)
+        if not sizes:
+            return
 
+        ids = list(sizes)
         try:
-            del self.torrent_states.config[tid]
-        except KeyError:
-            log.warning("remove_torrent(): no saved state for torrent {}".format(tid))
-            return True
+            # list of (torrent id, error message) tuples of torrents that failed to be removed:
+            errors = dict(await component.get("Core").remove_torrents(ids, remove_data))
         except Exception as e:
-            log.warning("remove_torrent(): Error deleting state for torrent {}: {}".format(tid, e))
-            return False
-        else:
-            return True
+            # batch may have failed part-way; torrents that are gone were removed:
+            log.warning("remove_torrents(): Problems removing %d torrents: %s", len(ids), e)
+            errors = dict((tid, e) for tid in ids if tid in self.torrentmanager.torrents)
+
+        for tid in ids:
+            if tid in errors:
+                log.warning("remove_torrents(): Problems removing torrent [%s]: %s", tid, errors[tid])
+                plan.counts['remove_failures'] += 1
+                continue
 
-    def get_labels(self, id):
+            if remove_data:
+                # note hardlinked data isn't freed by removal:
+                plan.volumes.get(tid, self.volumes.default).space.note_freed(plan.freed.get(tid, sizes[tid]))
+            self.ignore_store.discard(tid)
+            plan.counts['removed'] += 1
+            log.debug("remove_torrents(): successfully removed torrent: [%s]", tid)
+
+    def _get_scan_status_keys(self, config, rules):
+        """Returns union of status keys needed by the general filters and
+        all configured tracker & label rules"""
+        funcs = {config['filter'], config['filter2']}
+        funcs |= rules.general.metrics | rules.index.metrics
+        keys = _get_status_keys(funcs)
+        if _manages_space(config):
+            keys.append('save_path')  # for telling which volume torrent is on
+            if config['remove_data']:
+                keys.append('total_done')  # for projecting freed space
+        if config['scheduler'] == 'deadline' and 'state' not in keys:
+            keys.append('state')  # for filter_rates
+        return keys
+
+    def get_label(self, id, labelplus):
+        """Returns label of a single torrent, or '' if it has none"""
         lbl = ''
 
         try:
-            if self.config['labelplus']:
+            if labelplus:
                 lbl = component.get("CorePlugin.LabelPlus").get_torrent_label_name(id)
             else:
                 lbl = component.get("CorePlugin.Label")._status_get_label(id)
         except Exception as e:
-            log.warning("get_labels(): problem obtaining torrent {} labels: {}".format(id, e))
+            log.warning("get_label(): problem obtaining torrent {} labels: {}".format(id, e))
             lbl = ''
 
-        if type(lbl) is str and lbl:
-            return [lbl]
-        else:
-            return []  # TODO: mherz' tote94 fix sets default to ["none"] as opposed to empty arr - why, do we want that?  to be able to create rules for 'none' label?
-
-    def get_torrent_rules(self, id, torrent, tracker_rules, label_rules):
-
-        total_rules = []
+        return lbl
 
-        if tracker_rules:
+    def get_label_map(self, plan):
+        """Returns LabelMap of torrent labels for a scan. Label plugin's own
+        torrent -> label dict is read in one go; LabelPlus has no bulk accessor,
+        so its labels are fetched per torrent on first lookup, and memoized."""
+        labelplus = plan.config['labelplus']
+        if not labelplus:
             try:
-                for t in torrent.trackers:
-                    for name, rules in tracker_rules.items():
-                        log.debug("get_torrent_rules(): processing name = {}, rules = {}, url = {}, find = {} ".format(name, rules, t['url'], t['url'].find(name.lower())))
-                        if (t['url'].find(name.lower()) != -1):
-                            for rule in rules:
-                                total_rules.append(rule)
+                return LabelMap(dict(component.get("CorePlugin.Label").torrent_labels))
             except Exception as e:
-                log.warning("get_torrent_rules(): Exception with getting tracker rules for [{}]: {}".format(id, e))
-                return total_rules
-
-        if label_rules:
-            # if torrent has labels check them
-            labels = self.get_labels(id)
+                log.warning("get_label_map(): Label plugin's torrent labels unavailable: %s; "
+                            "falling back to per-torrent lookups", e)
 
-            for label in labels:
-                if label in label_rules:
-                    for rule in label_rules[label]:
-                        total_rules.append(rule)
+        phase = plan.timer.phase('labels')
 
-        log.debug("get_torrent_rules(): returning rules for [{}]: {}".format(id, total_rules))
-        return total_rules
+        def fetch(id):
+            with phase:
+                return self.get_label(id, labelplus)
 
-    # we don't use args or kwargs it just allows callbacks to happen cleanly
-    @ensure_deferred
-    async def periodic_scan(self, *args, **kwargs):
-        log.debug("starting periodic_scan() exec...")
-
-        if not self.config['enabled']:
-            log.debug("plugin not enabled, skipping periodic_scan()")
-            return
-
-        max_seeds = int(self.config['max_seeds'])
-        count_exempt = self.config['count_exempt']
-        remove_data = self.config['remove_data']
-        labelplus = self.config['labelplus']
-        exemp_trackers = self.config['trackers']
-        exemp_labels = self.config['labels']
-        min_val = float(self.config['min'])
-        min_val2 = float(self.config['min2'])
-        remove = self.config['remove']
-        tracker_rules = self.config['tracker_rules']
-        rule_1_chk = self.config['rule_1_enabled']
-        rule_2_chk = self.config['rule_2_enabled']
-        labels_enabled = False  # default to false
+        return LabelMap(fetch=fetch)
 
+    def get_labels_enabled(self, config):
         enabled_plugins = component.get("CorePluginManager").get_enabled_plugins()
+        labelplus = config['labelplus']
         if ((labelplus and 'LabelPlus' in enabled_plugins) or
                 (not labelplus and 'Label' in enabled_plugins)):
-            labels_enabled = True
-            # label_rules = self.config['label_rules']
-            label_rules = {k.lower(): v for k, v in self.config['label_rules'].items()}  # TODO from mherz' tote94 fix; why is lower-keyed dict needed?
-        else:
-            log.warning("WARNING! Label and/or LabelPlus plugin(s) not active")
-            log.warning("No labels will be checked for exemptions!")
-            label_rules = {}
-
-        # Negative max means unlimited seeds are allowed, so don't do anything
-        if max_seeds < 0:
-            return
+            return True
 
-        torrent_ids = self.torrentmanager.get_torrent_list()
+        log.warning("WARNING! Label and/or LabelPlus plugin(s) not active")
+        log.warning("No labels will be checked for exemptions!")
+        return False
 
-        log.debug("Number of torrents: {0}".format(len(torrent_ids)))
+    def get_torrent_match(self, id, torrent, plan):
+        """Returns TorrentMatch (exemption & specific rules) for given torrent"""
+        index = plan.rules.index
 
-        # If there are fewer torrents present than allowed, there's nothing to be done:
-        if len(torrent_ids) <= max_seeds:
-            return
+        try:
+            urls = tuple(t['url'] for t in torrent.trackers)
+        except Exception as e:
+            log.warning("get_torrent_match(): Exception with getting trackers for [{}]: {}".format(id, e))
+            urls = ()
 
+        if plan.labels_enabled and index.needs_labels:
+            labels = plan.labels.get(id)
+        else:
+            labels = ()
+
+        return index.match(id, urls, labels)
+
+    def get_torrent_rule(self, id, torrent, plan):
+        """Returns CompiledRule of tracker & label rules applying to given torrent,
+        or None if there are none"""
+        rule = self.get_torrent_match(id, torrent, plan).rule
+        log.debug("get_torrent_rule(): returning rule for [%s]: %s", id, rule)  # note rule is only rendered if logged
+        return rule
+
+    def is_exempt(self, id, torrent, plan):
+        # torrent is exempt if it's ignored, or its trackers or labels (if
+        # Label(Plus) plugin is enabled) are exempted
+        return (self.ignore_store.is_ignored(id) or
+                self.get_torrent_match(id, torrent, plan).exempt is not None)
+
+    async def collect_candidates(self, torrent_ids, plan):
+        """Returns finished torrents as ([(id, torrent), ...], [(id, torrent), ...])
+        tuple of non-exempt & exempt torrents"""
+        finished_torrents = []
         torrents = []
         ignored_torrents = []
+        slicer = plan.slicer
 
         # relevant torrents to us exist and are finished
-        for i in torrent_ids:
-            t = self.torrentmanager.torrents.get(i, None)
+        with plan.timer.phase('collect'):
+            for i in torrent_ids:
+                if slicer.due():
+                    await slicer.pause()
+                t = self.torrentmanager.torrents.get(i, None)
+
+                # TODO: deluge2.0 version of this script doesn't have this try-ex-else block:
+                # likely because the end of this function is way more convoluted/feature-packed than in this - delugev1 - ver?
+                try:
+                    finished = t.is_finished
+                    # finished = t.get_status(['is_finished'], update=True)['is_finished']  # TODO use this or attribute?
+                except Exception as e:
+                    log.warning("collect_candidates(): Cannot obtain torrent 'is_finished' attribute: {}".format(e))
+                    continue
+                else:
+                    if finished:
+                        finished_torrents.append((i, t))
+
+        # if torrent tracker or label in exemption list, or torrent ignored
+        # insert in the ignored torrents list
+        with plan.timer.phase('exempt'):
+            for i, t in finished_torrents:
+                if slicer.due():
+                    await slicer.pause()
+                (ignored_torrents if self.is_exempt(i, t, plan) else torrents).append((i, t))  # (id, torrent) tuple
+
+        return torrents, ignored_torrents
+
+    async def get_tracked_candidates(self, torrent_ids, plan):
+        """Same as collect_candidates(), but only re-resolves exemption of finished
+        torrents whose state changed since previous scan, as reported by deluge
+        events. Everything is rescanned every incremental_resync_hours, as
+        there are no events for label & tracker edits.
+
+        Config or ignore state may change while the scan yields to the reactor;
+        exemptions resolved before that are then used for this scan only, and
+        not stored, so the next one resyncs."""
+        generation = self.candidates_generation
+        resync_sec = self.config['incremental_resync_hours'] * 3600.0
+        if (plan.labels_enabled != self.candidates_labels_enabled or
+                self.clock() - self.candidates_synced >= resync_sec):
+            log.debug("get_tracked_candidates(): full rescan of %d torrents", len(torrent_ids))
+            (torrents, ignored_torrents) = await self.collect_candidates(torrent_ids, plan)
+            if generation != self.candidates_generation:
+                log.debug("get_tracked_candidates(): exemptions changed during rescan, not storing it")
+                return torrents, ignored_torrents
+            self.candidates = dict([(i, False) for i, t in torrents] + [(i, True) for i, t in ignored_torrents])
+            self.candidates_synced = self.clock()
+            self.candidates_labels_enabled = plan.labels_enabled
+            return torrents, ignored_torrents
 
-            # TODO: deluge2.0 version of this script doesn't have this try-ex-else block:
-            # likely because the end of this function is way more convoluted/feature-packed than in this - delugev1 - ver?
-            try:
-                finished = t.is_finished
-                # finished = t.get_status(['is_finished'], update=True)['is_finished']  # TODO use this or attribute?
-            except Exception as e:
-                log.warning("periodic_scan(): Cannot obtain torrent 'is_finished' attribute: {}".format(e))
-                continue
-            else:
-                if not finished:
+        torrents = []
+        ignored_torrents = []
+        exempt_phase = plan.timer.phase('exempt')
+        with plan.timer.phase('collect'):
+            for i, exempt in list(self.candidates.items()):
+                if plan.slicer.due():
+                    await plan.slicer.pause()
+                t = self.torrentmanager.torrents.get(i, None)
+                if t is None:
+                    self.candidates.pop(i, None)
                     continue
+                if exempt is None:
+                    with exempt_phase:
+                        exempt = self.is_exempt(i, t, plan)
+                    if generation == self.candidates_generation:
+                        self.candidates[i] = exempt
+                (ignored_torrents if exempt else torrents).append((i, t))
+
+        return torrents, ignored_torrents
+
+    @ensure_deferred
+    async def plan_scan(self, config, rules, dry_run=False):
+        """Runs the scan pipeline up to deciding which torrents to pause or
+        remove, w/o pausing or removing anything; returns ScanPlan.
+
+        Dry runs always walk all torrents instead of relying on the incremental
+        candidate set, as they may be run against a different config."""
+        plan = ScanPlan(config, rules, record=dry_run)
+        timer = plan.timer
+        slicer = plan.slicer  # loops over torrents yield to the reactor once their slice is used up
 
-            ignored = self.torrent_states.config.get(i, False)
-            trackers = t.trackers
-
-            # check if trackers in exempted tracker list
-            if exemp_trackers and not ignored:
-                for tracker, ex_tracker in (
-                    (t, ex_t) for t in trackers for ex_t in exemp_trackers
-                ):
-                    if (tracker['url'].find(ex_tracker.lower()) != -1):
-                        log.debug("periodic_scan(): Found exempted tracker: [%s]" % (ex_tracker))
-                        ignored = True
-                        break
-
-            # check if labels in exempted label list if Label(Plus) plugin is enabled
-            if exemp_labels and labels_enabled and not ignored:
-                # if torrent has labels check them
-                labels = self.get_labels(i)
-
-                for label, ex_label in (
-                    (l, ex_l) for l in labels for ex_l in exemp_labels
-                ):
-                    if (label.find(ex_label.lower()) != -1):
-                        log.debug("periodic_scan(): Found exempted label: [%s]" % (ex_label))
-                        ignored = True
-                        break
-
-            # if torrent tracker or label in exemption list, or torrent ignored
-            # insert in the ignored torrents list
-            (ignored_torrents if ignored else torrents).append((i, t))  # (id, torrent) tuple
-
-        log.debug("periodic_scan(): Number of finished torrents: {0}".format(len(torrents)))
-        log.debug("periodic_scan(): Number of ignored/exempt torrents: {0}".format(len(ignored_torrents)))
+        max_seeds = int(config['max_seeds'])
+        count_exempt = config['count_exempt']
+        remove_data = config['remove_data']
+        remove = config['remove']
+
+        # Negative max means unlimited seeds are allowed, so don't do anything
+        if max_seeds < 0:
+            plan.stop_reason = 'unlimited_seeds'
+            return plan
+
+        with timer.phase('collect'):
+            plan.labels_enabled = self.get_labels_enabled(config)
+            torrent_ids = self.torrentmanager.get_torrent_list()
+        if plan.labels_enabled and rules.index.needs_labels:
+            # read once, and shared by exemption & rule matching:
+            with timer.phase('labels'):
+                plan.labels = self.get_label_map(plan)
+        plan.counts['torrents'] = len(torrent_ids)
+
+        log.debug("Number of torrents: {0}".format(len(torrent_ids)))
+
+        # If there are fewer torrents present than allowed, there's nothing to be done:
+        if len(torrent_ids) <= max_seeds:
+            plan.stop_reason = 'below_max_seeds'
+            return plan
+
+        if config['incremental_scan'] and not dry_run:
+            (torrents, ignored_torrents) = await self.get_tracked_candidates(torrent_ids, plan)
+        else:
+            (torrents, ignored_torrents) = await self.collect_candidates(torrent_ids, plan)
+
+        plan.counts['finished'] = len(torrents)
+        plan.counts['exempt'] = len(ignored_torrents)
+        log.debug("plan_scan(): Number of finished torrents: {0}".format(len(torrents)))
+        log.debug("plan_scan(): Number of ignored/exempt torrents: {0}".format(len(ignored_torrents)))
 
         # now that we have trimmed active torrents
         # check again to make sure we still need to proceed
         if len(torrents) + (len(ignored_torrents) if count_exempt else 0) <= max_seeds:
-            return
+            plan.stop_reason = 'below_max_seeds'
+            return plan
 
         # if we are counting ignored torrents towards our maximum
         # then these have to come off the top of our allowance
@@ -539,114 +1124,448 @@ class Core(CorePluginBase):
             max_seeds -= len(ignored_torrents)
             if max_seeds < 0:
                 max_seeds = 0
+        plan.counts['max_seeds'] = max_seeds
+
+        # fetch every status key our filters & rules need in a single
+        # get_status() call per torrent, memoized for the rest of this scan:
+        with timer.phase('snapshot'):
+            threaded = config['scan_executor'] == 'thread'
+            status_keys = self._get_scan_status_keys(config, rules)
+            extra = dict((k, getattr(self, plugin_status_keys[k])) for k in status_keys if k in plugin_status_keys)
+            status_keys = [k for k in status_keys if k not in extra]
+
+            # the table is shared w/ scans that may be paused mid-way, so dry runs
+            # (e.g. w/ config overrides) never reset it; ones needing keys it
+            # doesn't track read status per torrent instead:
+            bulk = config['status_ingestion'] == 'bulk'
+            if bulk and dry_run and not self.status_table.covers(status_keys):
+                bulk = False
+            if bulk:
+                await self.refresh_status_table(self.status_table.keys if dry_run else status_keys)
+                snapshot = ScanSnapshot(status_keys, fetch=self.status_table.fetch, now=self.clock(), extra=extra)
+            else:
+                if not dry_run:
+                    self.status_table.clear()
+                snapshot = ScanSnapshot(status_keys, now=self.clock(), extra=extra)
 
         # Alternate sort by primary and secondary criteria
-        f1 = filter_funcs.get(self.config['filter'], _get_ratio)
-        f2 = filter_funcs.get(self.config['filter2'], _get_ratio)
+        f1 = filter_funcs.get(config['filter'], _get_ratio)
+        f2 = filter_funcs.get(config['filter2'], _get_ratio)
+        sort_funcs = (f1,) if f1 == f2 else (f1, f2)
         if f1 == f2:
-            sort_f = lambda x: f1(x)
+            sort_f = lambda x: sort_value(snapshot.value(f1, *x))
         else:
-            sort_f = lambda x: (f1(x), f2(x))
-
-        torrents.sort(
-            key=sort_f,
-            reverse=False
-        )
-
-        changed = False
-
-        # remove or pause these torrents
-        for i, t in reversed(torrents[max_seeds:]):
-
-            # check if free disk space below minimum
-            if self.check_min_space():
-                break  # we have enough space, do not remove any more
+            sort_f = lambda x: (sort_value(snapshot.value(f1, *x)), sort_value(snapshot.value(f2, *x)))
+
+        # torrents whose status can't be fetched (e.g. removed since listed) can't
+        # be ranked or have their rules evaluated; leave them out:
+        if len(torrents) > max_seeds:
+            with timer.phase('snapshot'):
+                readable = []
+                for x in torrents:
+                    if slicer.due():
+                        await slicer.pause()
+                    if snapshot.has_status(*x):
+                        readable.append(x)
+                    else:
+                        log.debug("plan_scan(): no status for [%s], leaving it out of candidates", x[0])
+                torrents = readable
+
+        planned_gb = {}  # space our planned removals will free up, per volume
+        manages_space = _manages_space(config)
+        watermark = self.get_watermarks(config)
+        satisfied = set()  # volumes w/ enough free space
+        volume_keys = None
+        deadline_mode = config['scheduler'] == 'deadline'
+        horizon = config['interval'] * 3600.0  # next interval scan re-evaluates everything anyway
+        # planner strategies need to know about every eligible torrent on a volume
+        # before picking, and only apply if removals actually free up space:
+        strategy = config['eviction_strategy'] if manages_space and remove and remove_data else 'order'
+        eligible = {}  # volume key -> (volume, [(rank, size, (i, t)), ...]); planner strategies only
+        rank = -1
+
+        # torrents sharing data are removed as a unit, credited w/ bytes that
+        # removing them really frees:
+        shared = None
+        held = {}  # group -> [(id, torrent), ...] eligible so far
+        unit_action = {}  # id -> action of groups that became eligible as a whole
+        if remove and remove_data and config['shared_data_aware']:
+            with timer.phase('inodes'):
+                for _ in self.inodes.iter_refresh(list(self.torrentmanager.torrents.items())):
+                    if slicer.due():
+                        await slicer.pause()
+            log.debug("plan_scan(): stat'ed files of %d torrents", self.inodes.stated)
+            shared = self.inodes
+
+        # pick torrents to remove or pause; candidates are yielded lazily
+        # in removal order, i.e. we never sort the whole list:
+        records = None  # id -> plain status record, for the worker thread
+        if threaded:
+            # capture plain copies of status records on the reactor; ranking & rule
+            # evaluation then run in a worker thread over those alone:
+            captured = []
+            with timer.phase('snapshot'):
+                if len(torrents) > max_seeds:
+                    for i, t in torrents:
+                        if slicer.due():
+                            await slicer.pause()
+                        captured.append(dict(snapshot.status(i, t)))
+            with timer.phase('worker'):
+                order = await threads.deferToThread(offload.rank, captured, sort_funcs, snapshot.now, max_seeds)
+            records = dict((torrents[idx][0], captured[idx]) for idx in order)
+            candidates = (torrents[idx] for idx in order)
+        else:
+            with timer.phase('sort'):
+                sort_keys = []
+                if len(torrents) > max_seeds:
+                    for x in torrents:
+                        if slicer.due():
+                            await slicer.pause()
+                        sort_keys.append(sort_f(x))
+                candidates = (torrents[idx] for idx in eviction_order(sort_keys, max_seeds))
+
+        # w/ the worker thread, rules of candidates are decided a chunk at a time,
+        # ahead of the walk below; as it usually stops early (e.g. once enough space
+        # is freed), the heap is only drained as far as it gets. Torrents missing
+        # from decisions are evaluated one by one:
+        decisions = {}
+        torrent_rules = {}
+        ahead = deque()  # candidates decided, but not walked yet
+        chunk = DECIDE_CHUNK
+
+        plan.stop_reason = 'candidates_exhausted'
+        while True:
+            if threaded and not ahead:
+                with timer.phase('sort'):
+                    ahead.extend(itertools.islice(candidates, chunk))
+                if ahead:
+                    await self.decide_chunk(ahead, plan, rules, records, snapshot.now, decisions, torrent_rules)
+                chunk = min(chunk * 2, DECIDE_CHUNK_MAX)
+            with timer.phase('sort'):
+                (i, t) = ahead.popleft() if ahead else next(candidates, (None, None))
+            if i is None:
+                break
+            rank += 1
+            if slicer.due():
+                await slicer.pause()
+
+            # check if free disk space of torrent's volume below minimum; note
+            # removing torrents from other volumes wouldn't help it:
+            vol = self.volumes.default
+            if manages_space:
+                with timer.phase('free_space'):
+                    vol = plan.volumes[i] = self.get_volume(snapshot.status(i, t).get('save_path'), config)
+                    if vol.key in satisfied:
+                        continue
+                    planned = planned_gb.get(vol.key, 0.0) if strategy == 'order' else 0.0
+                    if self.check_min_space(vol, watermark(vol.key), planned):
+                        satisfied.add(vol.key)
+                        if volume_keys is None:
+                            volume_keys = set(self.get_volume(snapshot.status(j, u).get('save_path'), config).key
+                                              for j, u in torrents)
+                        if volume_keys <= satisfied:
+                            plan.stop_reason = 'enough_space'
+                            break  # we have enough space, do not remove any more
+                        continue
 
             log.debug(
-                "periodic_scan(): starting remove-torrent rule checking for [%s], %s"
-                % (i, t.get_status(['name'])['name'])
+                "plan_scan(): starting remove-torrent rule checking for [%s], %s"
+                % (i, snapshot.status(i, t).get('name'))
             )
 
-            specific_rules = self.get_torrent_rules(i, t, tracker_rules, label_rules)
-
-            remove_cond = False  # if torrent should be removed or paused
-
             # If there are specific rules, ignore general remove rules
-            if specific_rules:
-                # Sort rules according to logical operators; AND is evaluated first
-                #
-                # TODO: why do we want AND to be first? doesn't it make at least
-                # very first AND pointless, as first rule's condition is dropped/ignored
-                # anyways; think AND should be evaluated LAST instead!
-                # oooor: don't sort at all, and leave the order as they're defined in conf/UI.
-                # note it'd be perfect to disable the logic gate on first item as it's
-                # ignored anyway;
-                #
-                # TODO2: also issues how specific_rules gets compiled: we process all tracker
-                #        rules, followed by label rules. as it stands it's difficult to keep the
-                #        _true_ rule order!
-                specific_rules.sort(key=lambda rule: rule[0])
-
-                first_spec_rule = specific_rules[0]
-                remove_cond = filter_funcs.get(first_spec_rule[1])((i, t)) >= float(first_spec_rule[2])
-                log.debug("1. spec rule %s: gate [%s]. fun: [%s], val: %s; remove_cond: %s",
-                          i, first_spec_rule[0], first_spec_rule[1], float(first_spec_rule[2]), remove_cond)
-
-                for rule_seq, rule in enumerate(specific_rules[1:], start=2):
-                    check_filter = filter_funcs.get(rule[1])((i, t)) >= float(rule[2])
-                    logic_gate = sel_funcs.get(rule[0])  # and/or/xor func
-                    # TODO: should we be calling logic_gate() with single, tuple arg?
-                    remove_cond = logic_gate((
-                        check_filter,
-                        remove_cond
-                    ))
-                    log.debug("%s. spec rule: gate [%s]. fun: [%s], val: %s; rule result: %s, aggregate remove_cond: %s",
-                              rule_seq, rule[0], rule[1], float(rule[2]), check_filter, remove_cond)
-            else:  # process general/global rules
-                filter1_res = filter_funcs.get(self.config['filter'], _get_ratio)((i, t))
-                filter2_res = filter_funcs.get(self.config['filter2'], _get_ratio)((i, t))
-
-                # Get result of first condition test
-                filter_1 = filter1_res >= min_val
-                # Get result of second condition test
-                filter_2 = filter2_res >= min_val2
-
-                log.debug("[{}] filter1 enabled: [{}], filter2 enabled: [{}]".format(i, rule_1_chk, rule_2_chk))
-                log.debug("filter1: {} >= {} = {}; filter2: {} >= {} = {}".format(filter1_res, min_val, filter_1, filter2_res, min_val2, filter_2))
-
-                if rule_1_chk and rule_2_chk:
-                    logic_gate = self.config['sel_func']
-                    log.debug("both filters enabled, using logic gate: [{}]".format(logic_gate))
-
-                    # If both rules active use custom logical function
-                    logic_gate = sel_funcs.get(logic_gate)  # and/or/xor func
-
-                    remove_cond = logic_gate((
-                        filter_1,
-                        filter_2
-                    ))
-                elif rule_1_chk and not rule_2_chk:
-                    # Evaluate only first rule, since the other is not active
-                    remove_cond = filter_1
-                elif not rule_1_chk and rule_2_chk:
-                    # Evaluate only second rule, since the other is not active
-                    remove_cond = filter_2
+            with timer.phase('match'):
+                rule = torrent_rules.get(i)
+                if rule is None:
+                    rule = self.get_torrent_rule(i, t, plan) or rules.general
+
+            values = {}
+
+            def get(func):
+                values[func] = snapshot.value(filter_funcs[func], i, t)
+                return values[func]
+
+            remove_cond = decisions.get(i)
+            if remove_cond is None:
+                with timer.phase('evaluate'):
+                    try:
+                        remove_cond = rule(get)
+                    except Exception as e:
+                        # one bad rule or status record shouldn't abort the whole scan:
+                        log.error("plan_scan(): cannot evaluate rule [%s] for [%s], keeping it: %s", rule, i, e)
+                        remove_cond = False
+                plan.counts['metric_reads'] += len(values)
+                plan.counts['metric_reads_skipped'] += len(rule.metrics) - len(values)
+            elif dry_run:
+                for func in rule.metrics:
+                    get(func)
+            log.debug("[%s] remove rule [%s] evaluated to: %s", i, rule, remove_cond)
+
+            # if kept, predict when its rule will become true:
+            eligible_in = None
+            if not remove_cond and deadline_mode:
+                with timer.phase('deadlines'):
+                    st = snapshot.status(i, t)
+                    rates = dict((m, f(st)) for m, f in filter_rates.items())
+                    eligible_in = time_to_eligible(rule, get, rates, horizon)
+                if eligible_in is not None:
+                    plan.deadlines.append((snapshot.now + eligible_in, i))
 
             # If logical functions are satisfied, remove or pause torrent:
+            action = 'keep'
             if remove_cond:
                 if not remove:
-                    self.pause_torrent(t)
+                    action = 'pause'
+                    plan.pause.append((i, t))
                 else:
-                    # note we deferToThread because of time.sleep() downstream
-                    if await threads.deferToThread(lambda: self.remove_torrent(i, t, remove_data)):
-                        changed = True
-                    # sleep a bit post-removal to give time for hdd space to be freed up;
-                    # on some seedboxes I've seen it takes a long time for space to be
-                    # reported as freed up, which can cause too many torrents to be removed
-                    # in the same invocation:
-                    if self.config['hdd_space'] > 0.0 and self.config['post_removal_sleep_sec'] > 0.0:
-                        await threads.deferToThread(lambda: time.sleep(self.config['post_removal_sleep_sec']))
-
-        # If a torrent exemption state has been removed save changes
-        if changed:
-            self.torrent_states.save()
+                    unit = ((i, t),)
+                    if shared is not None and len(shared.group(i)) > 1:
+                        group = shared.group(i)
+                        held.setdefault(group, []).append((i, t))
+                        unit = tuple(held[group]) if len(held[group]) == len(group) else None
+
+                    if unit is None:
+                        action = 'held'  # until rest of its group is eligible too
+                    else:
+                        size = sum(snapshot.status(j, u).get('total_done', 0) for j, u in unit)
+                        if shared is not None:
+                            freed = shared.freed(j for j, u in unit)
+                            if freed is not None:
+                                size = freed
+                                for j, u in unit:
+                                    plan.freed[j] = freed / len(unit)
+
+                        if strategy != 'order':
+                            action = 'eligible'  # settled by planner below
+                            eligible.setdefault(vol.key, (vol, []))[1].append((rank, size / GIB, unit))
+                        else:
+                            action = 'remove'
+                            plan.remove.extend(unit)
+                            if remove_data:
+                                planned_gb[vol.key] = planned_gb.get(vol.key, 0.0) + size / GIB
+                        for j, u in unit:
+                            unit_action[j] = action
+
+            plan.counts['evaluated'] += 1
+            if dry_run:
+                plan.record(
+                    torrent_id=i,
+                    name=snapshot.status(i, t).get('name', ''),
+                    action=action,
+                    rule=str(rule),
+                    specific_rule=rule is not rules.general,
+                    sort_values=dict((f, snapshot.value(filter_funcs.get(f, _get_ratio), i, t))
+                                     for f in (config['filter'], config['filter2'])),
+                    metrics=values,
+                    volume=vol.path,
+                    planned_gb=planned_gb.get(vol.key, 0.0),
+                    eligible_in=eligible_in
+                )
+
+        # groups that never became eligible as a whole are kept:
+        for entry in plan.entries or ():
+            if entry['action'] == 'held':
+                entry['action'] = unit_action.get(entry['torrent_id'], 'keep')
+
+        if eligible:
+            with timer.phase('plan'):
+                self.pick_evictions(plan, eligible, watermark, strategy, planned_gb)
+
+        plan.counts['planned_removals'] = len(plan.remove)
+        plan.counts['status_fetches'] = snapshot.fetches
+        plan.counts['slices'] = slicer.slices
+        return plan
+
+    async def decide_chunk(self, chunk, plan, rules, records, now, decisions, torrent_rules):
+        """Decides rules of a chunk of (id, torrent) candidates at once in a worker
+        thread, given records (id -> plain status record) & scan timestamp; fills
+        decisions (id -> bool) & torrent_rules (id -> rule)"""
+        timer = plan.timer
+        slicer = plan.slicer
+        ids = []
+        chunk_rules = []
+        with timer.phase('match'):
+            for i, t in chunk:
+                if slicer.due():
+                    await slicer.pause()
+                ids.append(i)
+                chunk_rules.append(self.get_torrent_match(i, t, plan).rule or rules.general)
+        torrent_rules.update(zip(ids, chunk_rules))
+
+        with timer.phase('worker'):
+            (decided, reads, skipped) = await threads.deferToThread(
+                offload.evaluate_rules, ids, chunk_rules, [records[i] for i in ids], now, filter_funcs)
+        decisions.update(decided)
+        plan.counts['metric_reads'] += reads
+        plan.counts['metric_reads_skipped'] += skipped
+
+    def pick_evictions(self, plan, eligible, watermark, strategy, planned_gb):
+        """Picks units (single torrents, or groups sharing data) to remove off each
+        volume from those eligible, as per eviction_strategy, so that the volume's deficit (its hdd_space minus free
+        space) is freed up in one go"""
+        picked = []
+        volume_of = {}
+        for key, (vol, items) in eligible.items():
+            min_hdd_space = watermark(key)
+            deficit = float('inf') if min_hdd_space < 0.0 else min_hdd_space - vol.space.free()
+            chosen = set(plan_evictions(items, deficit, strategy))
+            planned_gb[key] = planned_gb.get(key, 0.0) + sum(size for rank, size, unit in items if unit in chosen)
+            log.debug("pick_evictions(): %s strategy picked %d of %d units on [%s] to free %s GB",
+                      strategy, len(chosen), len(items), vol.path or 'default volume', deficit)
+            picked.extend((rank, unit) for rank, size, unit in items if unit in chosen)
+            for rank, size, unit in items:
+                for i, t in unit:
+                    volume_of[i] = key
+
+        # keep removal order across volumes:
+        plan.remove.extend(item for rank, unit in sorted(picked, key=lambda p: p[0]) for item in unit)
+
+        removed = set(i for i, t in plan.remove)
+        for entry in plan.entries or ():
+            if entry['action'] == 'eligible':
+                entry['action'] = 'remove' if entry['torrent_id'] in removed else 'keep'
+                entry['planned_gb'] = planned_gb.get(volume_of[entry['torrent_id']], 0.0)
+
+    @export
+    @ensure_deferred
+    async def simulate_scan(self, config_overrides=None):
+        """Dry run of a scan: returns the eviction plan periodic_scan() would
+        carry out, in removal order, along with metric values each torrent's rule
+        was evaluated against and time spent per scan phase. Nothing is paused
+        or removed.
+
+        config_overrides (dict) are applied on top of current config for this
+        run only, e.g. to preview a rule change prior to saving it."""
+        config = dict(self.config.config)
+        rules = self.rules
+        if config_overrides:
+            for key in list(config_overrides.keys()):
+                if key not in DEFAULT_PREFS:
+                    log.warning("simulate_scan(): ignoring unknown config key [%s]", key)
+                    continue
+                config[key] = config_overrides[key]
+            rules = compile_rules(config, self.get_remove_rules())
+
+        plan = await self.plan_scan(config, rules, dry_run=True)
+        result = plan.to_dict()
+        if _manages_space(config):
+            result['free_space_gb'] = dict((vol.path or 'default', vol.space.free()) for vol in set(plan.volumes.values()))
+        return result
+
+    # we don't use args or kwargs it just allows callbacks to happen cleanly
+    @ensure_deferred
+    async def periodic_scan(self, *args, **kwargs):
+        log.debug("starting periodic_scan() exec...")
+
+        if not self.config['enabled']:
+            log.debug("plugin not enabled, skipping periodic_scan()")
+            return
+
+        # scans are triggered both by looping_call & disk_watcher:
+        if self.scan_running:
+            log.debug("previous scan still running, skipping periodic_scan()")
+            return
+
+        self.scan_running = True
+        try:
+            await self.run_scan()
+        finally:
+            self.scan_running = False
+        self.update_watched_locations()
+
+    async def run_scan(self):
+        started = time.time()
+        plan = await self.plan_scan(self.config, self.rules)
+        timer = plan.timer
+        log.debug("periodic_scan(): planned in %.3fs, %s; stopped on: %s",
+                  timer.total(), timer.durations, plan.stop_reason)
+
+        # torrents may have been removed while planning waited on the reactor, be it
+        # between slices, on the worker thread, status or label fetches:
+        present = self.torrentmanager.torrents
+        plan.pause = [(i, t) for i, t in plan.pause if i in present]
+        plan.remove = [(i, t) for i, t in plan.remove if i in present]
+
+        with timer.phase('pause'):
+            for i, t in plan.pause:
+                if self.pause_torrent(t):
+                    plan.counts['paused'] += 1
+
+        # reannounce concurrently, and remove torrents whose trackers have been
+        # updated in batches as they're confirmed:
+        remove_data = self.config['remove_data']
+
+        def remove(batch):
+            with timer.phase('remove'):
+                return self.remove_torrents(batch, remove_data, plan)
+
+        batcher = RemovalBatcher(remove, REMOVE_BATCH_MAX, REMOVE_BATCH_SEC)
+
+        def confirm(i, t):
+            d = self.reannounce_before_removal(i, t, plan)
+            d.addCallback(lambda ok: batcher.add((i, t)) if ok else None)
+            return d
+
+        semaphore = defer.DeferredSemaphore(max(int(self.config['reannounce_concurrency']), 1))
+        with timer.phase('reannounce'):
+            await defer.gatherResults([semaphore.run(confirm, i, t) for i, t in plan.remove], consumeErrors=True)
+
+        with timer.phase('remove'):
+            await batcher.close()
+        log.debug("periodic_scan(): removed %d of %d torrents", plan.counts['removed'], len(plan.remove))
+
+        with timer.phase('state_save'):
+            self.ignore_store.flush()
+
+        self.scan_stats.add(plan, started, time.time() - started)
+        self.write_scan_stats()
+        self.schedule_deadline_scan(plan)
+
+    def next_interval_scan(self):
+        """Returns reactor time of the next scan due from looping_call, or None
+        if it isn't running"""
+        lc = self.looping_call
+        if not lc.running or not lc.interval:
+            return None
+        if lc.call is not None:
+            return lc.call.getTime()
+        # a scan started by looping_call itself is running; the next tick is
+        # scheduled once it's done, on the following multiple of interval since
+        # the loop started:
+        elapsed = lc.clock.seconds() - lc.starttime
+        return lc.starttime + (math.floor(elapsed / lc.interval) + 1) * lc.interval
+
+    def schedule_deadline_scan(self, plan):
+        """In deadline scheduler mode, schedules next scan for when the first torrent
+        kept by the last scan is expected to become eligible for removal, unless
+        the next interval scan comes first."""
+        if self.deadline_call is not None and self.deadline_call.active():
+            self.deadline_call.cancel()
+        self.deadline_call = None
+        if self.config['scheduler'] != 'deadline':
+            return
+
+        self.deadlines.replace(plan.deadlines)
+        earliest = self.deadlines.earliest()
+        if earliest is None:
+            return
+
+        (deadline, tid) = earliest
+        delay = max(deadline - self.clock(), DEADLINE_MIN_DELAY)
+        next_tick = self.next_interval_scan()
+        if next_tick is not None and next_tick - self.looping_call.clock.seconds() <= delay:
+            return
+
+        log.debug("schedule_deadline_scan(): next scan in %.0fs, when [%s] should become eligible; %d deadlines queued",
+                  delay, tid, len(self.deadlines))
+        self.deadline_call = reactor.callLater(delay, self.periodic_scan)
+
+    def write_scan_stats(self):
+        if not self.config['prometheus_textfile']:
+            return
+
+        path = deluge.configmanager.get_config_dir("autoremoveplus.prom")
+        try:
+            self.scan_stats.write_textfile(path)
+        except Exception as e:
+            log.warning("write_scan_stats(): Problems writing [%s]: %s", path, e)
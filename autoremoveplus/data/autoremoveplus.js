@@ -41,6 +41,7 @@ if (typeof(console) === 'undefined') {
 }
 
 Deluge.plugins.autoremoveplus.PLUGIN_NAME = 'AutoRemovePlus';
+Deluge.plugins.autoremoveplus.IGNORED_KEY = 'autoremoveplus_ignored';  // torrent status field
 Deluge.plugins.autoremoveplus.MODULE_NAME = 'autoremoveplus';
 Deluge.plugins.autoremoveplus.DISPLAY_NAME = _('AutoRemovePlus');
 Deluge.plugins.autoremoveplus.CHECK_PRECISION = 4;
@@ -916,36 +917,29 @@ Deluge.plugins.autoremoveplus.ui.PreferencePage = Ext.extend(Ext.TabPanel, {
     loadRules: function(tracker_rules, label_rules) {
         var store = this.tblRules.getStore();
 
-        var data = [];
-        var names = Ext.keys(tracker_rules);
-        for (var i = 0; i < names.length; i++) {
-            var name = names[i];
-            var keys = Ext.keys(tracker_rules[name]);
-            for (var j = 0; j < keys.length; j++) {
-              var key = keys[j];
-              data.push([
-                'Tracker',
-                name,
-                tracker_rules[name][key][0],
-                tracker_rules[name][key][1],
-                tracker_rules[name][key][2]
-              ]);
-            }
-        }
+        // expression rules can't be edited here; keep them aside so they're
+        // not lost when prefs are saved:
+        this.expressionRules = {'Tracker': {}, 'Label': {}};
 
-        var names = Ext.keys(label_rules);
-        for (var i = 0; i < names.length; i++) {
-            var name = names[i];
-            var keys = Ext.keys(label_rules[name]);
-            for (var j = 0; j < keys.length; j++) {
-              var key = keys[j];
-              data.push([
-                'Label',
-                name,
-                label_rules[name][key][0],
-                label_rules[name][key][1],
-                label_rules[name][key][2]
-              ]);
+        var data = [];
+        var types = [['Tracker', tracker_rules], ['Label', label_rules]];
+        for (var t = 0; t < types.length; t++) {
+            var type = types[t][0];
+            var rules = types[t][1];
+            var names = Ext.keys(rules);
+            for (var i = 0; i < names.length; i++) {
+                var name = names[i];
+                var ruleList = Ext.isString(rules[name]) ? [rules[name]] : rules[name];
+                for (var j = 0; j < ruleList.length; j++) {
+                  var rule = ruleList[j];
+                  if (Ext.isString(rule)) {
+                    Deluge.plugins.autoremoveplus.util
+                      .setdefault(this.expressionRules[type], name, [])
+                      .push(rule);
+                    continue;
+                  }
+                  data.push([type, name, rule[0], rule[1], rule[2]]);
+                }
             }
         }
 
@@ -994,6 +988,18 @@ Deluge.plugins.autoremoveplus.ui.PreferencePage = Ext.extend(Ext.TabPanel, {
               .push([op, rule, min]);
         }
 
+        var expressionRules = this.expressionRules || {'Tracker': {}, 'Label': {}};
+        var names = Ext.keys(expressionRules['Tracker']);
+        for (var i = 0; i < names.length; i++) {
+          var rules = Deluge.plugins.autoremoveplus.util.setdefault(trackerRules, names[i], []);
+          rules.push.apply(rules, expressionRules['Tracker'][names[i]]);
+        }
+        names = Ext.keys(expressionRules['Label']);
+        for (var i = 0; i < names.length; i++) {
+          var rules = Deluge.plugins.autoremoveplus.util.setdefault(labelRules, names[i], []);
+          rules.push.apply(rules, expressionRules['Label'][names[i]]);
+        }
+
         var filterVal = this.removeByContainer.getComponent(2).getValue();
         var filterVal2 = this.removeByContainer2.getComponent(2).getValue();
 
@@ -1069,13 +1075,24 @@ Deluge.plugins.autoremoveplus.Plugin = Ext.extend(Deluge.Plugin, {
 
             listeners: {
                 checkchange: function(checkitem,checked) {
-                    //console.log('Torrent checked...');
-                    console.log(checked);
-                    deluge.client.autoremoveplus.set_ignore(deluge.torrents.getSelectedIds(),checked);
-                }
+                    var ids = deluge.torrents.getSelectedIds();
+                    deluge.client.autoremoveplus.set_ignore(ids,checked);
+                    this.onIgnoreEvent(ids, checked);
+                },
+                scope: this
             }
         }]);
 
+        // ignore state of torrents comes along w/ the torrent list's regular
+        // updates, and is overridden by core's events as soon as it changes,
+        // so the menu renders w/o a get_ignore round trip:
+        this.ignored = {};
+        if (Deluge.Keys.Grid.indexOf(Deluge.plugins.autoremoveplus.IGNORED_KEY) < 0) {
+            Deluge.Keys.Grid.push(Deluge.plugins.autoremoveplus.IGNORED_KEY);
+        }
+        deluge.events.on('AutoRemovePlusIgnoreEvent', this.onIgnoreEvent, this);
+        deluge.events.on('TorrentRemovedEvent', this.onTorrentRemoved, this);
+
 		deluge.menus.torrent.on('show', this.updateExempt, this);
 
         console.log('%s enabled', Deluge.plugins.autoremoveplus.PLUGIN_NAME);
@@ -1087,18 +1104,56 @@ Deluge.plugins.autoremoveplus.Plugin = Ext.extend(Deluge.Plugin, {
         this.prefsPage.destroy();
 
         deluge.menus.torrent.un('show', this.updateExempt, this);
+        deluge.events.un('AutoRemovePlusIgnoreEvent', this.onIgnoreEvent, this);
+        deluge.events.un('TorrentRemovedEvent', this.onTorrentRemoved, this);
+        Deluge.Keys.Grid.remove(Deluge.plugins.autoremoveplus.IGNORED_KEY);
 
         console.log('%s disabled', Deluge.plugins.autoremoveplus.PLUGIN_NAME);
     },
 
-    //TODO block setChecked signal
+    onIgnoreEvent: function(torrentIds, ignore) {
+        Ext.each(torrentIds, function(id) {
+            this.ignored[id] = ignore;
+        }, this);
+    },
+
+    onTorrentRemoved: function(torrentId) {
+        delete this.ignored[torrentId];
+    },
+
+    isIgnored: function(torrent) {
+        // undefined if not known yet
+        if (this.ignored.hasOwnProperty(torrent.id)) {
+            return this.ignored[torrent.id];
+        }
+        return torrent.get(Deluge.plugins.autoremoveplus.IGNORED_KEY);
+    },
+
     updateExempt: function() {
-    	console.log('Updating checkitem...');
     	var checkitem = deluge.menus.torrent.getComponent('exempt');
-    	deluge.client.autoremoveplus.get_ignore(deluge.torrents.getSelectedIds(), {
+        var selected = deluge.torrents.getSelections();
+        var missing = [];
+        var checked = true;
+        Ext.each(selected, function(torrent) {
+            var ignored = this.isIgnored(torrent);
+            if (ignored === undefined) {
+                missing.push(torrent.id);
+            } else if (!ignored) {
+                checked = false;
+            }
+        }, this);
+
+        // suppress checkchange, as it would set_ignore() the shown state:
+        if (!missing.length) {
+            checkitem.setChecked(checked, true);
+            return;
+        }
+    	deluge.client.autoremoveplus.get_ignore(missing, {
             success: function(ignored) {
-                var checked = ignored.indexOf(false) < 0;
-                checkitem.setChecked(checked);
+                Ext.each(missing, function(id, i) {
+                    this.ignored[id] = ignored[i];
+                }, this);
+                checkitem.setChecked(checked && ignored.indexOf(false) < 0, true);
             },
             scope: this
         });
@@ -0,0 +1,101 @@
+#
+# deadlines.py
+#
+# Copyright (C) 2026 Laur <layr@hot.ee>
+#
+# Deluge is free software.
+#
+# You may redistribute it and/or modify it under the terms of the
+# GNU General Public License, as published by the Free Software
+# Foundation; either version 3 of the License, or (at your option)
+# any later version.
+#
+# deluge is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with deluge.    If not, write to:
+#   The Free Software Foundation, Inc.,
+#   51 Franklin Street, Fifth Floor
+#   Boston, MA  02110-1301, USA.
+#
+#    In addition, as a special exception, the copyright holders give
+#    permission to link the code of portions of this program with the OpenSSL
+#    library.
+#    You must obey the GNU General Public License in all respects for all of
+#    the code used other than OpenSSL. If you modify file(s) with this
+#    exception, you may extend this exception to your version of the file(s),
+#    but you are not obligated to do so. If you do not wish to do so, delete
+#    this exception statement from your version. If you delete this exception
+#    statement from all source files in the program, then also delete it here.
+#
+
+import heapq
+import numbers
+
+MIN_DELAY = 60.0  # seconds between deadline scans at minimum; keeps mispredictions from causing scan storms
+
+
+def time_to_eligible(rule, get, rates, horizon):
+    """Returns seconds until CompiledRule `rule` becomes true, assuming metrics grow
+    linearly at `rates` ({metric: units per second}) and all others stay put, or
+    None if it won't within `horizon` seconds; `get` returns current values.
+
+    Truth of the rule can only change where one of its comparisons on a growing
+    metric flips, so it's evaluated just past each of those breakpoints in turn.
+    """
+    current = {}
+    breakpoints = set()
+    for metric, op, value in rule.comparisons:
+        rate = rates.get(metric, 0.0)
+        if rate <= 0.0 or op in ('==', '!='):
+            continue
+        m = current[metric] = get(metric)
+        if not isinstance(m, numbers.Number) or isinstance(m, bool) or not isinstance(value, numbers.Number):
+            continue
+        t = (value - m) / rate
+        if 0.0 <= t <= horizon:
+            breakpoints.add(t)
+
+    for t in sorted(breakpoints):
+        t += 1.0  # just past it, for > & <
+
+        def get_at(metric):
+            rate = rates.get(metric, 0.0)
+            if rate > 0.0 and metric in current:
+                return current[metric] + rate * t
+            return get(metric)
+
+        if rule(get_at):
+            return t
+    return None
+
+
+class DeadlineQueue(object):
+    """Priority queue of times torrents are expected to become eligible for
+    removal at, earliest first"""
+
+    def __init__(self):
+        self._heap = []
+        self._deadlines = {}  # torrent id -> deadline
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def replace(self, deadlines):
+        """Replaces contents w/ [(deadline, torrent id), ...]"""
+        self._deadlines = dict((tid, when) for when, tid in deadlines)
+        self._heap = [(when, tid) for tid, when in self._deadlines.items()]
+        heapq.heapify(self._heap)
+
+    def discard(self, tid):
+        self._deadlines.pop(tid, None)  # heap entry is dropped lazily
+
+    def earliest(self):
+        """Returns (deadline, torrent id) tuple of the earliest deadline, or None"""
+        heap = self._heap
+        while heap and self._deadlines.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+        return heap[0] if heap else None
@@ -0,0 +1,263 @@
+#
+# freespace.py
+#
+# Copyright (C) 2026 Laur <layr@hot.ee>
+#
+# Deluge is free software.
+#
+# You may redistribute it and/or modify it under the terms of the
+# GNU General Public License, as published by the Free Software
+# Foundation; either version 3 of the License, or (at your option)
+# any later version.
+#
+# deluge is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with deluge.    If not, write to:
+#   The Free Software Foundation, Inc.,
+#   51 Franklin Street, Fifth Floor
+#   Boston, MA  02110-1301, USA.
+#
+#    In addition, as a special exception, the copyright holders give
+#    permission to link the code of portions of this program with the OpenSSL
+#    library.
+#    You must obey the GNU General Public License in all respects for all of
+#    the code used other than OpenSSL. If you modify file(s) with this
+#    exception, you may extend this exception to your version of the file(s),
+#    but you are not obligated to do so. If you do not wish to do so, delete
+#    this exception statement from your version. If you delete this exception
+#    statement from all source files in the program, then also delete it here.
+#
+
+from collections import deque, namedtuple
+import functools
+import logging
+import os
+import time
+
+from twisted.internet.task import LoopingCall
+
+log = logging.getLogger(__name__)
+
+GIB = 1073741824.0
+
+
+class FreeSpaceService(object):
+    """Cached free space readings, projected by the data we've removed since.
+
+    Real measurements (e.g. forking quota(1)) are only taken once the cached
+    one is older than `ttl` seconds. Bytes freed by our own removals are added
+    on top of the last measurement until it catches up: every new measurement
+    reconciles its increase against the oldest pending removals, and pending
+    removals older than `pending_ttl` seconds are assumed to be reflected by
+    the filesystem (or never will be) and are dropped.
+
+    Values are in GB, as returned by the `read` callable.
+    """
+
+    def __init__(self, read, ttl=30.0, pending_ttl=600.0, clock=time.time):
+        self.ttl = ttl
+        self.pending_ttl = pending_ttl
+        self._read = read
+        self._clock = clock
+        self._measured = None
+        self._measured_at = 0.0
+        self._pending = deque()  # [time, GB] of removals not yet reflected in measurements
+
+    def invalidate(self):
+        """Expires the cached reading; it's still kept as the baseline next
+        measurement reconciles pending removals against"""
+        self._measured_at = float('-inf')
+
+    def note_freed(self, nbytes):
+        """Records removal of data taking up given amount of bytes"""
+        if nbytes > 0:
+            self._pending.append([self._clock(), nbytes / GIB])
+
+    def pending(self):
+        return sum(gb for t, gb in self._pending)
+
+    def measure(self):
+        now = self._clock()
+        free = self._read()
+
+        gained = free - self._measured if self._measured is not None else 0.0
+        while self._pending and (gained > 0.0 or now - self._pending[0][0] > self.pending_ttl):
+            entry = self._pending[0]
+            if now - entry[0] > self.pending_ttl or entry[1] <= gained:
+                gained -= entry[1]
+                self._pending.popleft()
+            else:
+                entry[1] -= gained
+                gained = 0.0
+
+        self._measured = free
+        self._measured_at = now
+        return free
+
+    def free(self):
+        """Returns projected free space, in GB"""
+        if self._measured is None or self._clock() - self._measured_at >= self.ttl:
+            self.measure()
+        projected = self._measured + self.pending()
+        log.debug("FreeSpaceService: measured %s GB, projected %s GB", self._measured, projected)
+        return projected
+
+
+def statvfs_free(path):
+    """Returns bytes available to unprivileged users on filesystem holding path"""
+    st = os.statvfs(path)
+    return st.f_bavail * st.f_frsize
+
+
+class DiskWatcher(object):
+    """Samples free space of download locations every few seconds w/ statvfs(),
+    which unlike a full scan is cheap, and calls `trigger` as soon as any of
+    them drops below `watermark` GB.
+
+    `watermark(path)` returns the threshold for given path in GB; negative
+    ones are ignored.
+
+    Triggers are debounced: after one, the next may only happen `cooldown`
+    seconds later, doubling for every consecutive trigger up to `max_cooldown`,
+    as long as free space stays below the watermark; i.e. a scan that can't
+    free anything up won't be re-run back to back.
+    """
+
+    def __init__(self, trigger, watermark, cooldown=60.0, max_cooldown=3600.0, free=statvfs_free, clock=time.time):
+        self.trigger = trigger
+        self.watermark = watermark
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._free = free
+        self._clock = clock
+        self._paths = []
+        self._backoff = cooldown
+        self._next_allowed = 0.0
+        self._loop = LoopingCall(self.sample)
+
+    def set_paths(self, paths):
+        """Sets download locations to watch; only one path per filesystem is kept"""
+        devices = {}
+        for path in paths:
+            try:
+                devices.setdefault(os.stat(path).st_dev, path)
+            except OSError as e:
+                log.debug("DiskWatcher: not watching [%s]: %s", path, e)
+        self._paths = sorted(devices.values())
+
+    def start(self, interval):
+        """(Re)starts sampling every `interval` seconds; a non-positive interval stops it"""
+        self.stop()
+        self._backoff = self.cooldown
+        if interval > 0:
+            self._loop.start(interval, now=False)
+
+    def stop(self):
+        if self._loop.running:
+            self._loop.stop()
+
+    def sample(self):
+        low = []
+        for path in self._paths:
+            watermark = self.watermark(path)
+            if watermark < 0.0:
+                continue
+            try:
+                free = self._free(path) / GIB
+            except OSError as e:
+                log.debug("DiskWatcher: cannot stat [%s]: %s", path, e)
+                continue
+            if free < watermark:
+                low.append((path, free, watermark))
+
+        if not low:
+            self._backoff = self.cooldown
+            return
+
+        now = self._clock()
+        if now < self._next_allowed:
+            return
+
+        self._next_allowed = now + self._backoff
+        self._backoff = min(self._backoff * 2, self.max_cooldown)
+        log.info("DiskWatcher: free space low on %s; triggering scan",
+                 ', '.join('[{}]: {:.2f}/{} GB'.format(p, gb, wm) for p, gb, wm in low))
+        self.trigger()
+
+
+# a filesystem torrents are saved on; key is its device id, or None for the
+# default volume:
+Volume = namedtuple('Volume', ['key', 'path', 'space'])
+
+
+class VolumeSpace(object):
+    """FreeSpaceService per volume torrents are saved on, keyed by device id of
+    their save paths. Device ids are cached per path; paths that can't be
+    stat'ed map to the default volume, measured by `default` FreeSpaceService.
+    """
+
+    def __init__(self, default, free=statvfs_free):
+        self.default = Volume(None, None, default)
+        self._free = free
+        self._devices = {}  # path -> st_dev
+        self._volumes = {}  # st_dev -> Volume
+
+    def reset(self):
+        """Drops cached path -> device mapping, expires readings, and applies
+        default's ttls to all volumes. Volumes themselves are kept, as their
+        pending removals may not have reached the filesystem yet."""
+        self._devices = {}
+        self.invalidate()
+        for vol in self._volumes.values():
+            vol.space.ttl = self.default.space.ttl
+            vol.space.pending_ttl = self.default.space.pending_ttl
+
+    def invalidate(self):
+        """Forces fresh readings of all volumes"""
+        self.default.space.invalidate()
+        for vol in self._volumes.values():
+            vol.space.invalidate()
+
+    def device(self, path):
+        try:
+            return self._devices[path]
+        except KeyError:
+            pass
+
+        try:
+            dev = os.stat(path).st_dev
+        except (OSError, TypeError, ValueError) as e:
+            log.debug("VolumeSpace: cannot stat [%s]: %s", path, e)
+            dev = None
+        self._devices[path] = dev
+        return dev
+
+    def _read(self, path):
+        return self._free(path) / GIB
+
+    def volume(self, path):
+        """Returns Volume given path resides on"""
+        dev = self.device(path) if path else None
+        if dev is None:
+            return self.default
+
+        try:
+            return self._volumes[dev]
+        except KeyError:
+            space = FreeSpaceService(functools.partial(self._read, path),
+                                     self.default.space.ttl, self.default.space.pending_ttl)
+            vol = self._volumes[dev] = Volume(dev, path, space)
+            return vol
+
+    def watermarks(self, watermarks_by_path):
+        """Resolves {path: GB} dict to {volume key: GB}"""
+        watermarks = {}
+        for path, gb in watermarks_by_path.items():
+            dev = self.device(path)
+            if dev is not None:
+                watermarks[dev] = float(gb)
+        return watermarks
@@ -55,6 +55,12 @@ from .common import get_resource
 log = logging.getLogger(__name__)
 
 
+def _rule_list(rules):
+    # rule set is either a list of [gate, func, value] triples and/or expression
+    # strings, or a single expression string; see core's rules.py
+    return [rules] if isinstance(rules, str) else rules
+
+
 class Gtk3UI(Gtk3PluginBase):
 
     def enable(self):
@@ -73,6 +79,8 @@ class Gtk3UI(Gtk3PluginBase):
             self.on_show_prefs
         )
 
+        self.expression_rules = {'Tracker': {}, 'Label': {}}
+
         # Create and fill remove rule list
         self.rules = Gtk.ListStore(str, str)
         client.autoremoveplus.get_remove_rules().addCallback(self.cb_get_rules)
@@ -153,6 +161,18 @@ class Gtk3UI(Gtk3PluginBase):
             self.on_click_chk_rule_2
         )
 
+        # torrent id -> ignore state, kept up to date by core's events, so the
+        # menu renders w/o a get_ignore() round trip; only torrents missing
+        # from it (e.g. added since) are asked for:
+        self.ignored = {}
+        self.event_handlers = [
+            ("AutoRemovePlusIgnoreEvent", self.on_ignore_event),
+            ("TorrentRemovedEvent", self.on_torrent_removed_event)
+        ]
+        for event, handler in self.event_handlers:
+            client.register_event_handler(event, handler)
+        client.core.get_torrents_status({}, ["autoremoveplus_ignored"]).addCallback(self.cb_ignored_status)
+
         def on_menu_show(menu, menu_item_toggled):
             (menu_item, toggled) = menu_item_toggled
 
@@ -163,10 +183,22 @@ class Gtk3UI(Gtk3PluginBase):
                 menu_item.set_active(False not in ignored)
                 menu_item.handler_unblock(toggled)
 
-            client.autoremoveplus.get_ignore([t for t in component.get("TorrentView").get_selected_torrents() ]).addCallback(set_ignored)
+            selected = component.get("TorrentView").get_selected_torrents()
+            missing = [t for t in selected if t not in self.ignored]
+            if not missing:
+                set_ignored([self.ignored[t] for t in selected])
+                return
+
+            def cb_get_ignore(ignored):
+                self.ignored.update(zip(missing, ignored))
+                set_ignored([self.ignored.get(t, False) for t in selected])
+
+            client.autoremoveplus.get_ignore(missing).addCallback(cb_get_ignore)
 
         def on_menu_toggled(menu):
-            client.autoremoveplus.set_ignore(component.get("TorrentView").get_selected_torrents(), menu.get_active())
+            selected = component.get("TorrentView").get_selected_torrents()
+            client.autoremoveplus.set_ignore(selected, menu.get_active())
+            self.on_ignore_event(selected, menu.get_active())
 
         self.menu = Gtk.CheckMenuItem(_("AutoRemovePlus Exempt"))
         self.menu.show()
@@ -190,12 +222,26 @@ class Gtk3UI(Gtk3PluginBase):
         torrentmenu.disconnect(self.show_sig)
         torrentmenu.disconnect(self.realize_sig)
 
+        for event, handler in self.event_handlers:
+            client.deregister_event_handler(event, handler)
+
         del self.rules
         del self.sel_func_store
         del self.menu
         del self.show_sig
         del self.realize_sig
 
+    def on_ignore_event(self, torrent_ids, ignore):
+        for t in torrent_ids:
+            self.ignored[t] = ignore
+
+    def on_torrent_removed_event(self, torrent_id):
+        self.ignored.pop(torrent_id, None)
+
+    def cb_ignored_status(self, status):
+        for t, st in status.items():
+            self.ignored[t] = st.get("autoremoveplus_ignored", False)
+
     def on_click_remove(self, check):
         checked = check.get_active()
         self.builder.get_object("chk_remove_data").set_sensitive(checked)
@@ -291,6 +337,11 @@ class Gtk3UI(Gtk3PluginBase):
             else:  # row[0] == "Label"
                 label_rules.setdefault(row[1], []).append(rule)
 
+        for name, expressions in self.expression_rules['Tracker'].items():
+            tracker_rules.setdefault(name, []).extend(expressions)
+        for name, expressions in self.expression_rules['Label'].items():
+            label_rules.setdefault(name, []).extend(expressions)
+
         config = {
             'max_seeds': self.builder.get_object('spn_seeds').get_value_as_int(),
             'filter': c.get_model()[c.get_active_iter()][0],
@@ -345,9 +396,15 @@ class Gtk3UI(Gtk3PluginBase):
         # TODO: tracker & label rules should be in same array to preserve ordering!
         # has implications on logic in core.py
         self.lstore_rules.clear()
+        # expression rules can't be edited here; keep them aside so they're
+        # not lost when prefs are applied:
+        self.expression_rules = {'Tracker': {}, 'Label': {}}
         tracker_rules = config['tracker_rules']
         for tracker in tracker_rules:
-            for rule in tracker_rules[tracker]:
+            for rule in _rule_list(tracker_rules[tracker]):
+                if isinstance(rule, str):
+                    self.expression_rules['Tracker'].setdefault(tracker, []).append(rule)
+                    continue
                 for row in list(self.rules):
                     if row[0] == rule[1]:
                         rule_text = row[1]
@@ -357,7 +414,10 @@ class Gtk3UI(Gtk3PluginBase):
 
         label_rules = config['label_rules']
         for label in label_rules:
-            for rule in label_rules[label]:
+            for rule in _rule_list(label_rules[label]):
+                if isinstance(rule, str):
+                    self.expression_rules['Label'].setdefault(label, []).append(rule)
+                    continue
                 for row in list(self.rules):
                     if row[0] == rule[1]:
                         rule_text = row[1]
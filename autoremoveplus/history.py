@@ -0,0 +1,219 @@
+#
+# history.py
+#
+# Copyright (C) 2026 Laur <layr@hot.ee>
+#
+# Deluge is free software.
+#
+# You may redistribute it and/or modify it under the terms of the
+# GNU General Public License, as published by the Free Software
+# Foundation; either version 3 of the License, or (at your option)
+# any later version.
+#
+# deluge is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with deluge.    If not, write to:
+#   The Free Software Foundation, Inc.,
+#   51 Franklin Street, Fifth Floor
+#   Boston, MA  02110-1301, USA.
+#
+#    In addition, as a special exception, the copyright holders give
+#    permission to link the code of portions of this program with the OpenSSL
+#    library.
+#    You must obey the GNU General Public License in all respects for all of
+#    the code used other than OpenSSL. If you modify file(s) with this
+#    exception, you may extend this exception to your version of the file(s),
+#    but you are not obligated to do so. If you do not wish to do so, delete
+#    this exception statement from your version. If you delete this exception
+#    statement from all source files in the program, then also delete it here.
+#
+
+import hashlib
+import logging
+import math
+import mmap
+import os
+import struct
+
+log = logging.getLogger(__name__)
+
+MAGIC = b'ARPH'
+VERSION = 1
+
+# file layout:
+#   header: magic, version, slots, row capacity, number of samples taken so far
+#   slot timestamps: slots doubles, 0 if slot was never written
+#   rows: capacity x (20 byte torrent key, slots doubles of sampled values, NaN if none)
+_HEADER = struct.Struct('<4sIIIQ')
+_KEY_SIZE = 20
+_NO_KEY = b'\0' * _KEY_SIZE
+_DOUBLE = struct.Struct('<d')
+_NAN = float('nan')
+
+
+def _key(tid):
+    """Returns 20 byte key of torrent id; deluge's ids are hex sha1 digests"""
+    try:
+        key = bytes.fromhex(tid)
+        if len(key) == _KEY_SIZE:
+            return key
+    except ValueError:
+        pass
+    return hashlib.sha1(tid.encode('utf-8')).digest()
+
+
+class MetricHistory(object):
+    """Fixed-size ring buffers of a sampled per-torrent counter (e.g. total
+    uploaded bytes), one row per torrent, in a memory-mapped file.
+
+    All torrents are sampled at once, so a sample's timestamp is kept once per
+    ring slot rather than per torrent; a row costs 8 bytes per slot plus its
+    20 byte key. Rows are reused once their torrent is discarded, and the file
+    grows by doubling when it runs out of rows.
+    """
+
+    def __init__(self, path, slots, capacity=1024):
+        self.path = path
+        self.slots = slots
+        self._row_size = _KEY_SIZE + slots * _DOUBLE.size
+        self._rows_at = _HEADER.size + slots * _DOUBLE.size
+        self._rows = {}  # key -> row
+        self._free = []
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._file = os.fdopen(fd, 'r+b')
+        size = os.fstat(fd).st_size
+        header = None
+        if size >= _HEADER.size:
+            self._file.seek(0)
+            header = _HEADER.unpack(self._file.read(_HEADER.size))
+        if header is None or header[:3] != (MAGIC, VERSION, slots):
+            if size:
+                log.info("MetricHistory: [%s] has different layout, starting over", path)
+            self._create(capacity)
+        else:
+            self._map()
+        self._index()
+
+    def _create(self, capacity):
+        self._file.truncate(0)
+        self._file.truncate(self._rows_at + capacity * self._row_size)
+        self._map()
+        _HEADER.pack_into(self._mm, 0, MAGIC, VERSION, self.slots, capacity, 0)
+        (self.capacity, self.taken) = (capacity, 0)
+        for row in range(capacity):
+            self._clear(row)
+
+    def _map(self):
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+        (_, _, _, self.capacity, self.taken) = _HEADER.unpack_from(self._mm, 0)
+
+    def _index(self):
+        self._rows = {}
+        self._free = []
+        for row in range(self.capacity - 1, -1, -1):
+            key = self._mm[self._row_at(row):self._row_at(row) + _KEY_SIZE]
+            if key == _NO_KEY:
+                self._free.append(row)
+            else:
+                self._rows[key] = row
+
+    def _row_at(self, row):
+        return self._rows_at + row * self._row_size
+
+    def _clear(self, row):
+        at = self._row_at(row)
+        self._mm[at:at + _KEY_SIZE] = _NO_KEY
+        struct.pack_into('<%dd' % self.slots, self._mm, at + _KEY_SIZE, *([_NAN] * self.slots))
+
+    def _grow(self):
+        old = self.capacity
+        self._mm.close()
+        self._file.truncate(self._rows_at + 2 * old * self._row_size)
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+        self.capacity = 2 * old
+        _HEADER.pack_into(self._mm, 0, MAGIC, VERSION, self.slots, self.capacity, self.taken)
+        for row in range(old, self.capacity):
+            self._clear(row)
+        self._free.extend(range(self.capacity - 1, old - 1, -1))
+
+    def __len__(self):
+        return len(self._rows)
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.flush()
+            self._mm.close()
+            self._mm = None
+            self._file.close()
+
+    def discard(self, tid):
+        row = self._rows.pop(_key(tid), None)
+        if row is not None:
+            self._clear(row)
+            self._free.append(row)
+
+    def retain(self, tids):
+        """Discards rows of torrents not in tids"""
+        keep = set(_key(t) for t in tids)
+        for key in [k for k in self._rows if k not in keep]:
+            row = self._rows.pop(key)
+            self._clear(row)
+            self._free.append(row)
+
+    def sample(self, values, now):
+        """Records {torrent id: value} as the newest sample, taken at now;
+        torrents w/ rows but missing from values get no value for it."""
+        slot = self.taken % self.slots
+        _DOUBLE.pack_into(self._mm, _HEADER.size + slot * _DOUBLE.size, now)
+
+        seen = set()
+        for tid, value in values.items():
+            key = _key(tid)
+            row = self._rows.get(key)
+            if row is None:
+                if not self._free:
+                    self._grow()
+                row = self._rows[key] = self._free.pop()
+                at = self._row_at(row)
+                self._mm[at:at + _KEY_SIZE] = key
+            _DOUBLE.pack_into(self._mm, self._row_at(row) + _KEY_SIZE + slot * _DOUBLE.size, float(value))
+            seen.add(row)
+
+        for row in self._rows.values():
+            if row not in seen:
+                _DOUBLE.pack_into(self._mm, self._row_at(row) + _KEY_SIZE + slot * _DOUBLE.size, _NAN)
+
+        self.taken += 1
+        _HEADER.pack_into(self._mm, 0, MAGIC, VERSION, self.slots, self.capacity, self.taken)
+        self._mm.flush()
+
+    def samples(self, tid):
+        """Returns torrent's samples as [(timestamp, value), ...], newest first"""
+        row = self._rows.get(_key(tid))
+        if row is None:
+            return []
+
+        times = struct.unpack_from('<%dd' % self.slots, self._mm, _HEADER.size)
+        values = struct.unpack_from('<%dd' % self.slots, self._mm, self._row_at(row) + _KEY_SIZE)
+        result = []
+        for k in range(min(self.taken, self.slots)):
+            slot = (self.taken - 1 - k) % self.slots
+            if not math.isnan(values[slot]):
+                result.append((times[slot], values[slot]))
+        return result
+
+
+def change_since(samples, current, since):
+    """Returns (change, timestamp) of a counter's current value against its
+    baseline sample, the newest one taken at or before since, and the time the
+    baseline was taken at; (None, None) if samples don't reach back that far,
+    as the change over part of the window would understate it."""
+    for ts, value in samples:  # newest first
+        if ts <= since:
+            return max(current - value, 0.0), ts
+    return None, None
@@ -0,0 +1,202 @@
+#
+# inodes.py
+#
+# Copyright (C) 2026 Laur <layr@hot.ee>
+#
+# Deluge is free software.
+#
+# You may redistribute it and/or modify it under the terms of the
+# GNU General Public License, as published by the Free Software
+# Foundation; either version 3 of the License, or (at your option)
+# any later version.
+#
+# deluge is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with deluge.    If not, write to:
+#   The Free Software Foundation, Inc.,
+#   51 Franklin Street, Fifth Floor
+#   Boston, MA  02110-1301, USA.
+#
+#    In addition, as a special exception, the copyright holders give
+#    permission to link the code of portions of this program with the OpenSSL
+#    library.
+#    You must obey the GNU General Public License in all respects for all of
+#    the code used other than OpenSSL. If you modify file(s) with this
+#    exception, you may extend this exception to your version of the file(s),
+#    but you are not obligated to do so. If you do not wish to do so, delete
+#    this exception statement from your version. If you delete this exception
+#    statement from all source files in the program, then also delete it here.
+#
+
+import logging
+import os
+import time
+
+log = logging.getLogger(__name__)
+
+# how long a torrent's stat'ed files are trusted for; files may get replaced or
+# (un)linked behind our back, e.g. by cross-seeding tools:
+MAX_AGE = 3600.0
+
+
+class InodeIndex(object):
+    """Index of torrents' files by (st_dev, st_ino), telling which torrents share
+    data via hardlinks or by pointing at the same files (cross-seeds), and how
+    many bytes removing torrents w/ their data really frees.
+
+    Files are stat'ed once per torrent and re-stat'ed only once stale, or when
+    torrent's save path changes. Torrents sharing at least one inode make up a
+    group, which should only ever be removed as a whole: removing just part of
+    it frees nothing, or deletes data the rest still seeds.
+    """
+
+    def __init__(self, stat=os.stat, clock=time.time, max_age=MAX_AGE):
+        self._stat = stat
+        self._clock = clock
+        self.max_age = max_age
+        self._files = {}  # id -> (save_path, stamp, ((path, (dev, ino), size, nlink), ...))
+        self._groups = {}  # id -> sorted tuple of ids sharing data w/ it, if any
+        self._inodes = {}  # (dev, ino) -> (size, nlink, {path, ...}, {id, ...})
+        self._dirty = False
+        self.stated = 0
+
+    def __contains__(self, tid):
+        return tid in self._files
+
+    def discard(self, tid):
+        if self._files.pop(tid, None) is not None:
+            self._dirty = True
+
+    def clear(self):
+        self._files = {}
+        self._groups = {}
+        self._inodes = {}
+        self._dirty = False
+
+    def refresh(self, torrents):
+        """Brings index up to date w/ [(id, torrent), ...]: stats files of
+        torrents that are new, moved or stale, and drops the ones gone.
+        Returns number of torrents whose files were stat'ed."""
+        for _ in self.iter_refresh(torrents):
+            pass
+        return self.stated
+
+    def iter_refresh(self, torrents):
+        """Same as refresh(), but yields after every torrent, so callers can
+        spread the work; number of torrents stat'ed is left in `stated`."""
+        now = self._clock()
+        seen = set()
+        self.stated = 0
+        for tid, torrent in torrents:
+            seen.add(tid)
+            yield
+            try:
+                save_path = torrent.options['download_location']
+            except Exception as e:
+                log.debug("InodeIndex: cannot get save path of [%s]: %s", tid, e)
+                self.discard(tid)
+                continue
+
+            entry = self._files.get(tid)
+            if entry is not None and entry[0] == save_path and now - entry[1] < self.max_age:
+                continue
+
+            files = self._stat_files(tid, torrent, save_path)
+            if files is None:
+                self.discard(tid)
+            else:
+                self._files[tid] = (save_path, now, files)
+                self._dirty = True
+            self.stated += 1
+
+        for tid in [tid for tid in self._files if tid not in seen]:
+            self.discard(tid)
+
+        if self._dirty:
+            self._rebuild()
+
+    def _stat_files(self, tid, torrent, save_path):
+        try:
+            torrent_files = torrent.get_files()
+        except Exception as e:
+            log.debug("InodeIndex: cannot list files of [%s]: %s", tid, e)
+            return None
+
+        files = []
+        for f in torrent_files:
+            path = os.path.join(save_path, f['path'])
+            try:
+                st = self._stat(path)
+            except OSError:
+                continue  # not (yet) there, frees nothing
+            files.append((path, (st.st_dev, st.st_ino), st.st_size, st.st_nlink))
+        return tuple(files)
+
+    def _rebuild(self):
+        inodes = {}
+        for tid, (save_path, stamp, files) in self._files.items():
+            for path, inode, size, nlink in files:
+                node = inodes.get(inode)
+                if node is None:
+                    node = inodes[inode] = (size, nlink, set(), set())
+                node[2].add(path)
+                node[3].add(tid)
+
+        # union-find over torrents sharing an inode:
+        parent = {}
+
+        def find(x):
+            while parent.get(x, x) != x:
+                parent[x] = parent.get(parent[x], parent[x])
+                x = parent[x]
+            return x
+
+        for size, nlink, paths, tids in inodes.values():
+            if len(tids) > 1:
+                tids = iter(tids)
+                root = find(next(tids))
+                for tid in tids:
+                    other = find(tid)
+                    if other != root:
+                        parent[other] = root
+
+        members = {}
+        for tid in set(parent) | set(parent.values()):
+            members.setdefault(find(tid), []).append(tid)
+        groups = {}
+        for tids in members.values():
+            group = tuple(sorted(tids))
+            for tid in group:
+                groups[tid] = group
+
+        self._inodes = inodes
+        self._groups = groups
+        self._dirty = False
+
+    def group(self, tid):
+        """Returns sorted tuple of ids of torrents sharing data w/ tid, itself
+        included; (tid,) if it shares nothing"""
+        return self._groups.get(tid, (tid,))
+
+    def freed(self, tids):
+        """Returns bytes removing all of tids w/ their data frees up: only inodes
+        referenced by no other torrent, and w/ no hardlinks outside of them.
+        Returns None if any of tids isn't indexed."""
+        tids = set(tids)
+        inodes = set()
+        for tid in tids:
+            entry = self._files.get(tid)
+            if entry is None:
+                return None
+            inodes.update(inode for path, inode, size, nlink in entry[2])
+
+        freed = 0
+        for inode in inodes:
+            size, nlink, paths, owners = self._inodes[inode]
+            if owners <= tids and nlink <= len(paths):
+                freed += size
+        return freed
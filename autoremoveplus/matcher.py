@@ -0,0 +1,200 @@
+#
+# matcher.py
+#
+# Copyright (C) 2026 Laur <layr@hot.ee>
+#
+# Deluge is free software.
+#
+# You may redistribute it and/or modify it under the terms of the
+# GNU General Public License, as published by the Free Software
+# Foundation; either version 3 of the License, or (at your option)
+# any later version.
+#
+# deluge is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with deluge.    If not, write to:
+#   The Free Software Foundation, Inc.,
+#   51 Franklin Street, Fifth Floor
+#   Boston, MA  02110-1301, USA.
+#
+#    In addition, as a special exception, the copyright holders give
+#    permission to link the code of portions of this program with the OpenSSL
+#    library.
+#    You must obey the GNU General Public License in all respects for all of
+#    the code used other than OpenSSL. If you modify file(s) with this
+#    exception, you may extend this exception to your version of the file(s),
+#    but you are not obligated to do so. If you do not wish to do so, delete
+#    this exception statement from your version. If you delete this exception
+#    statement from all source files in the program, then also delete it here.
+#
+
+from collections import deque, namedtuple
+import logging
+
+from .rules import CompiledRule, NEVER, RuleError, fold, node_metrics, rule_set_terms
+
+log = logging.getLogger(__name__)
+
+
+class SubstringMatcher(object):
+    """Aho-Corasick automaton finding which of given patterns occur in a text.
+
+    Semantics are those of `text.find(pattern) != -1` for every pattern, but
+    the text is scanned once regardless of the number of patterns.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self._goto = [{}]
+        self._out = [set()]
+
+        for idx, pattern in enumerate(self.patterns):
+            node = 0
+            for ch in pattern:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto.append({})
+                    self._out.append(set())
+                    self._goto[node][ch] = nxt
+                node = nxt
+            self._out[node].add(idx)
+
+        # empty pattern is found in any text:
+        self._always = frozenset(self._out[0])
+
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] |= self._out[self._fail[nxt]] - self._always
+
+        self._out = [frozenset(o) for o in self._out]
+
+    def __bool__(self):
+        return bool(self.patterns)
+
+    def _walk(self, text):
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                yield out[node]
+
+    def search(self, text):
+        """Returns set of indices of patterns found in text"""
+        found = set(self._always)
+        for out in self._walk(text):
+            found |= out
+        return found
+
+    def first(self, text):
+        """Returns first pattern found in text, or None"""
+        if self._always:
+            return self.patterns[min(self._always)]
+        for out in self._walk(text):
+            return self.patterns[min(out)]
+        return None
+
+
+# exempt: exemption pattern the torrent matched, if any
+# rule: CompiledRule combining all tracker & label rule sets that apply to the
+#       torrent, or None if there are none
+TorrentMatch = namedtuple('TorrentMatch', ['exempt', 'rule'])
+
+
+def _compile_terms(name, rules, metrics):
+    try:
+        return rule_set_terms(rules, metrics)
+    except (RuleError, ValueError, TypeError) as e:
+        # rather not remove anything than remove by a rule we don't understand:
+        log.error("RuleIndex: invalid rule(s) for [%s]: %s; no torrents will be removed by it", name, e)
+        return [('and', NEVER)]
+
+
+class RuleIndex(object):
+    """Exemption & tracker/label rule matching, compiled once per config.
+
+    Match results are cached per torrent and only recomputed when the
+    torrent's tracker urls or labels change. Rule sets are compiled once
+    per distinct combination of matched tracker & label names.
+    """
+
+    def __init__(self, exempt_trackers, exempt_labels, tracker_rules, label_rules, metrics, costs=None):
+        self._exempt_trackers = SubstringMatcher(t.lower() for t in exempt_trackers)
+        self._exempt_labels = SubstringMatcher(l.lower() for l in exempt_labels)
+
+        self._tracker_terms = [_compile_terms(name, rules, metrics) for name, rules in tracker_rules.items()]
+        self._tracker_matcher = SubstringMatcher(name.lower() for name in tracker_rules)
+        self._label_terms = {k.lower(): _compile_terms(k, v, metrics) for k, v in label_rules.items()}
+
+        self.metrics = set()
+        for terms in self._tracker_terms + list(self._label_terms.values()):
+            for gate, node in terms:
+                self.metrics |= node_metrics(node)
+
+        self.needs_labels = bool(self._exempt_labels or self._label_terms)
+        self._cache = {}
+        self._rules = {}  # signature -> CompiledRule
+        self._costs = costs
+
+    def discard(self, tid):
+        self._cache.pop(tid, None)
+
+    def _get_rule(self, signature):
+        rule = self._rules.get(signature)
+        if rule is None:
+            terms = []
+            for kind, key in signature:
+                terms.extend(self._tracker_terms[key] if kind == 't' else self._label_terms[key])
+            rule = self._rules[signature] = CompiledRule(fold(terms), self._costs)
+        return rule
+
+    def match(self, tid, urls, labels):
+        """Returns TorrentMatch for torrent w/ given tracker urls & labels"""
+        key = (urls, labels)
+        cached = self._cache.get(tid)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        exempt = None
+        for url in urls:
+            exempt = self._exempt_trackers.first(url)
+            if exempt is not None:
+                log.debug("RuleIndex: Found exempted tracker: [%s]", exempt)
+                break
+        else:
+            for label in labels:
+                exempt = self._exempt_labels.first(label)
+                if exempt is not None:
+                    log.debug("RuleIndex: Found exempted label: [%s]", exempt)
+                    break
+
+        # signature of rule sets that apply, in order: tracker rules first, then label rules:
+        signature = []
+        if self._tracker_matcher:
+            seen = set()
+            for url in urls:
+                for idx in sorted(self._tracker_matcher.search(url) - seen):
+                    seen.add(idx)
+                    signature.append(('t', idx))
+        for label in labels:
+            if label in self._label_terms:
+                signature.append(('l', label))
+
+        match = TorrentMatch(exempt, self._get_rule(tuple(signature)) if signature else None)
+        self._cache[tid] = (key, match)
+        return match
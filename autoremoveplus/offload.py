@@ -0,0 +1,73 @@
+#
+# offload.py
+#
+# Copyright (C) 2026 Laur <layr@hot.ee>
+#
+# Deluge is free software.
+#
+# You may redistribute it and/or modify it under the terms of the
+# GNU General Public License, as published by the Free Software
+# Foundation; either version 3 of the License, or (at your option)
+# any later version.
+#
+# deluge is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with deluge.    If not, write to:
+#   The Free Software Foundation, Inc.,
+#   51 Franklin Street, Fifth Floor
+#   Boston, MA  02110-1301, USA.
+#
+#    In addition, as a special exception, the copyright holders give
+#    permission to link the code of portions of this program with the OpenSSL
+#    library.
+#    You must obey the GNU General Public License in all respects for all of
+#    the code used other than OpenSSL. If you modify file(s) with this
+#    exception, you may extend this exception to your version of the file(s),
+#    but you are not obligated to do so. If you do not wish to do so, delete
+#    this exception statement from your version. If you delete this exception
+#    statement from all source files in the program, then also delete it here.
+#
+# Scan work that runs off the reactor thread.
+#
+# Functions here only read plain status records (dicts captured from torrents on
+# the reactor beforehand) and compiled rules, and never touch Deluge's torrent
+# objects or plugin state, so they're safe to run via deferToThread() while the
+# reactor keeps serving RPCs & events.
+#
+
+from .selection import eviction_order, sort_value
+
+
+def rank(records, sort_funcs, now, keep):
+    """Returns indexes of records in removal order, as plan_scan() walks them:
+    by sort_funcs' values, highest first, leaving the lowest keep records out"""
+    keys = [tuple(sort_value(f(st, now)) for f in sort_funcs) for st in records]
+    return list(eviction_order(keys, keep))
+
+
+def evaluate_rules(candidates, rules, records, now, filters):
+    """Evaluates rules of all candidates against their status records; returns
+    ({id: bool}, metric reads, metric reads skipped). Candidates whose rule
+    raises are left out of the result, for the caller to evaluate (and log) on
+    the reactor."""
+    decisions = {}
+    reads = skipped = 0
+    for tid, rule, st in zip(candidates, rules, records):
+        values = {}
+
+        def get(func):
+            if func not in values:
+                values[func] = filters[func](st, now)
+            return values[func]
+
+        try:
+            decisions[tid] = rule(get)
+        except Exception:
+            continue
+        reads += len(values)
+        skipped += len(rule.metrics) - len(values)
+    return decisions, reads, skipped
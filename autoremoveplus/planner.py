@@ -0,0 +1,87 @@
+#
+# planner.py
+#
+# Copyright (C) 2026 Laur <layr@hot.ee>
+#
+# Deluge is free software.
+#
+# You may redistribute it and/or modify it under the terms of the
+# GNU General Public License, as published by the Free Software
+# Foundation; either version 3 of the License, or (at your option)
+# any later version.
+#
+# deluge is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with deluge.    If not, write to:
+#   The Free Software Foundation, Inc.,
+#   51 Franklin Street, Fifth Floor
+#   Boston, MA  02110-1301, USA.
+#
+#    In addition, as a special exception, the copyright holders give
+#    permission to link the code of portions of this program with the OpenSSL
+#    library.
+#    You must obey the GNU General Public License in all respects for all of
+#    the code used other than OpenSSL. If you modify file(s) with this
+#    exception, you may extend this exception to your version of the file(s),
+#    but you are not obligated to do so. If you do not wish to do so, delete
+#    this exception statement from your version. If you delete this exception
+#    statement from all source files in the program, then also delete it here.
+#
+
+# eviction strategies:
+#   order:  remove eligible torrents in filter/filter2 sort order until enough is freed
+#   fewest: free the deficit w/ as few removals as possible, i.e. largest torrents first
+#   value:  free the deficit losing as little seeding value as possible, where a
+#           torrent's value is its position in the sort order (torrents sorted
+#           last, i.e. ones `filter` would keep the longest, being most valuable)
+STRATEGIES = ('order', 'fewest', 'value')
+
+
+def plan_evictions(candidates, deficit, strategy):
+    """Picks which of eligible candidates to remove to free more than `deficit` GB.
+
+    candidates is a list of (rank, size, item) tuples, rank being the candidate's
+    position in eviction order (0 = first to go) and size its on-disk size in GB.
+    Returns picked items in eviction order; if all candidates together can't cover
+    the deficit, all of them are returned.
+    """
+    if sum(size for rank, size, item in candidates) <= deficit:
+        return [item for rank, size, item in sorted(candidates)]
+
+    if strategy == 'fewest':
+        # the k largest torrents free the most any k torrents can:
+        order = sorted(candidates, key=lambda c: (-c[1], c[0]))
+    elif strategy == 'value':
+        # cheapest seeding value per GB freed first; torrents freeing nothing never help:
+        order = sorted((c for c in candidates if c[1] > 0), key=lambda c: ((c[0] + 1) / c[1], c[0]))
+    else:
+        order = sorted(candidates)
+
+    picked = []
+    freed = 0.0
+    for c in order:
+        picked.append(c)
+        freed += c[1]
+        if freed > deficit:
+            break
+
+    # drop picks made redundant by later (bigger) ones, most valuable first:
+    for c in sorted(picked, reverse=True):
+        if freed - c[1] > deficit:
+            picked.remove(c)
+            freed -= c[1]
+
+    if strategy == 'value':
+        # ratio-greedy can overshoot small deficits; a single torrent covering
+        # all of it on its own may be cheaper:
+        covering = [c for c in candidates if c[1] > deficit]
+        if covering:
+            cheapest = min(covering)
+            if cheapest[0] + 1 < sum(c[0] + 1 for c in picked):
+                picked = [cheapest]
+
+    return [item for rank, size, item in sorted(picked)]
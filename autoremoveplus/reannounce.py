@@ -0,0 +1,137 @@
+#
+# reannounce.py
+#
+# Copyright (C) 2026 Laur <layr@hot.ee>
+#
+# Deluge is free software.
+#
+# You may redistribute it and/or modify it under the terms of the
+# GNU General Public License, as published by the Free Software
+# Foundation; either version 3 of the License, or (at your option)
+# any later version.
+#
+# deluge is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with deluge.    If not, write to:
+#   The Free Software Foundation, Inc.,
+#   51 Franklin Street, Fifth Floor
+#   Boston, MA  02110-1301, USA.
+#
+#    In addition, as a special exception, the copyright holders give
+#    permission to link the code of portions of this program with the OpenSSL
+#    library.
+#    You must obey the GNU General Public License in all respects for all of
+#    the code used other than OpenSSL. If you modify file(s) with this
+#    exception, you may extend this exception to your version of the file(s),
+#    but you are not obligated to do so. If you do not wish to do so, delete
+#    this exception statement from your version. If you delete this exception
+#    statement from all source files in the program, then also delete it here.
+#
+
+import logging
+
+from twisted.internet import defer, reactor
+
+log = logging.getLogger(__name__)
+
+
+class _Waiter(object):
+    __slots__ = ('deferred', 'trackers', 'errors', 'timeout_call')
+
+    def __init__(self, trackers):
+        self.deferred = defer.Deferred()
+        self.trackers = trackers
+        self.errors = 0
+        self.timeout_call = None
+
+
+class AnnounceWaiter(object):
+    """Confirms tracker announces via libtorrent's tracker alerts.
+
+    Register on_tracker_reply & on_tracker_error as tracker_reply_alert &
+    tracker_error_alert handlers; wait() returns a Deferred firing True once
+    any tracker replied to the torrent's announce, or False once all its
+    trackers errored or the timeout passed.
+    """
+
+    def __init__(self):
+        self._waiting = {}  # torrent id -> [_Waiter, ...]
+
+    def wait(self, tid, trackers, timeout):
+        """Call before issuing the announce, so no reply is missed."""
+        waiter = _Waiter(max(trackers, 1))
+        self._waiting.setdefault(tid, []).append(waiter)
+        waiter.timeout_call = reactor.callLater(timeout, self._fire, tid, waiter, False)
+        return waiter.deferred
+
+    def cancel(self, tid):
+        for waiter in list(self._waiting.get(tid, [])):
+            self._fire(tid, waiter, False)
+
+    def _fire(self, tid, waiter, result):
+        waiters = self._waiting.get(tid, [])
+        if waiter in waiters:
+            waiters.remove(waiter)
+            if not waiters:
+                del self._waiting[tid]
+        if waiter.timeout_call.active():
+            waiter.timeout_call.cancel()
+        if not waiter.deferred.called:
+            waiter.deferred.callback(result)
+
+    def on_tracker_reply(self, alert):
+        tid = str(alert.handle.info_hash())
+        for waiter in list(self._waiting.get(tid, [])):
+            log.debug("AnnounceWaiter: tracker replied for torrent [%s]", tid)
+            self._fire(tid, waiter, True)
+
+    def on_tracker_error(self, alert):
+        tid = str(alert.handle.info_hash())
+        for waiter in list(self._waiting.get(tid, [])):
+            waiter.errors += 1
+            log.debug("AnnounceWaiter: tracker error %d/%d for torrent [%s]", waiter.errors, waiter.trackers, tid)
+            if waiter.errors >= waiter.trackers:
+                self._fire(tid, waiter, False)
+
+
+class RemovalBatcher(object):
+    """Hands torrents confirmed for removal to `remove` ([(id, torrent), ...] ->
+    Deferred) in batches, as confirmations come in: once `size` of them are
+    pending, or the oldest pending one has waited `delay` seconds. So one slow
+    tracker doesn't hold up removal of everything else, while Deluge still
+    saves its session state once per batch instead of after every torrent.
+    """
+
+    def __init__(self, remove, size, delay, clock=reactor):
+        self.size = max(size, 1)
+        self.delay = delay
+        self._remove = remove
+        self._clock = clock
+        self._pending = []
+        self._flush_call = None
+        self._removals = []
+
+    def add(self, item):
+        self._pending.append(item)
+        if len(self._pending) >= self.size:
+            self.flush()
+        elif self._flush_call is None:
+            self._flush_call = self._clock.callLater(self.delay, self.flush)
+
+    def flush(self):
+        if self._flush_call is not None and self._flush_call.active():
+            self._flush_call.cancel()
+        self._flush_call = None
+        if self._pending:
+            (batch, self._pending) = (self._pending, [])
+            self._removals.append(defer.maybeDeferred(self._remove, batch))
+
+    def close(self):
+        """Removes what's still pending; returns Deferred firing once all batches
+        have been removed"""
+        self.flush()
+        return defer.gatherResults(self._removals, consumeErrors=True)
@@ -0,0 +1,389 @@
+#
+# rules.py
+#
+# Copyright (C) 2026 Laur <layr@hot.ee>
+#
+# Deluge is free software.
+#
+# You may redistribute it and/or modify it under the terms of the
+# GNU General Public License, as published by the Free Software
+# Foundation; either version 3 of the License, or (at your option)
+# any later version.
+#
+# deluge is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with deluge.    If not, write to:
+#   The Free Software Foundation, Inc.,
+#   51 Franklin Street, Fifth Floor
+#   Boston, MA  02110-1301, USA.
+#
+#    In addition, as a special exception, the copyright holders give
+#    permission to link the code of portions of this program with the OpenSSL
+#    library.
+#    You must obey the GNU General Public License in all respects for all of
+#    the code used other than OpenSSL. If you modify file(s) with this
+#    exception, you may extend this exception to your version of the file(s),
+#    but you are not obligated to do so. If you do not wish to do so, delete
+#    this exception statement from your version. If you delete this exception
+#    statement from all source files in the program, then also delete it here.
+#
+
+#
+# Removal rule expressions.
+#
+# Tracker & label rule sets (tracker_rules/label_rules config values) are lists
+# of [gate, func, value] triples as produced by the UIs, e.g.
+#
+#   [["and", "func_ratio", 2.0], ["or", "func_seed_time", 48]]
+#
+# which is read left-to-right as shown in the UI, i.e. the above equals to
+# `func_ratio >= 2.0 or func_seed_time >= 48`, and the first gate is ignored;
+# and/or expression strings (the rule set may also be a single string) such as
+#
+#   (func_ratio >= 2 and func_seed_time > 48) or not func_state == seeding
+#
+# Operands are comparisons of a metric from get_remove_rules() against a value,
+# using one of >=, >, <=, <, ==, !=. Values are numbers, or (quoted or bare)
+# strings; strings only compare w/ == & != against metrics whose values are
+# strings (see STRING_METRICS), numbers against all others. Operators by decreasing precedence: not, and, xor, or; parentheses
+# group as usual.
+#
+# Everything is parsed into a small tuple-based AST when config is set, and
+# compiled into closures taking a `get(metric_name)` callable that returns the
+# metric value for the torrent being evaluated. and/or operands are evaluated
+# cheapest first as per metric costs, and short-circuit, so costly metrics are
+# only read if they can still change the outcome.
+#
+# A comparison against a metric w/o a value (None) is neither true nor false,
+# but unknown, and so is its negation; and/or/xor follow three-valued logic
+# (e.g. `false and unknown` is false, `true and unknown` unknown), which doesn't
+# depend on operand order. A rule evaluating to unknown is false.
+#
+
+import functools
+import logging
+import operator
+import re
+
+log = logging.getLogger(__name__)
+
+COMPARISONS = {
+    '>=': operator.ge,
+    '>': operator.gt,
+    '<=': operator.le,
+    '<': operator.lt,
+    '==': operator.eq,
+    '!=': operator.ne
+}
+
+GATES = ('and', 'or', 'xor')
+
+NEVER = ('const', False)
+
+# metrics whose values are strings; all others are numbers:
+STRING_METRICS = frozenset(['func_state'])
+
+_TOKEN_RE = re.compile(r'''
+    \s*(?:
+        (?P<op>>=|<=|==|!=|=|>|<)
+      | (?P<paren>[()])
+      | (?P<num>[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)
+      | (?P<str>"[^"]*"|'[^']*')
+      | (?P<word>[A-Za-z_][A-Za-z0-9_.-]*)
+    )''', re.VERBOSE)
+
+
+class RuleError(ValueError):
+    pass
+
+
+def check_comparison(metric, op, value):
+    """Raises RuleError unless metric can be compared w/ value using op, i.e.
+    rules are rejected when compiled instead of failing to evaluate"""
+    if metric in STRING_METRICS:
+        if not isinstance(value, str):
+            raise RuleError('[{}] compares against strings, not [{}]'.format(metric, value))
+        if op not in ('==', '!='):
+            raise RuleError('[{}] only supports == and !=, not [{}]'.format(metric, op))
+    elif not isinstance(value, float):
+        raise RuleError('[{}] compares against numbers, not [{}]'.format(metric, value))
+
+
+def _tokenize(text):
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        m = _TOKEN_RE.match(text, pos)
+        if m is None:
+            raise RuleError('unexpected input at position {}: [{}]'.format(pos, text[pos:]))
+        pos = m.end()
+        kind = m.lastgroup
+        value = m.group(kind)
+        if kind == 'word' and value.lower() in GATES + ('not',):
+            kind, value = 'kw', value.lower()
+        elif kind == 'op' and value == '=':
+            value = '=='
+        elif kind == 'str':
+            value = value[1:-1]
+        tokens.append((kind, value))
+    return tokens
+
+
+class _Parser(object):
+
+    def __init__(self, text, metrics):
+        self.text = text
+        self.metrics = metrics
+        self.tokens = _tokenize(text)
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def take(self, kind=None, value=None):
+        tok = self.peek()
+        if tok[0] is None or (kind and tok[0] != kind) or (value and tok[1] != value):
+            raise RuleError('expected {} in [{}], got [{}]'.format(value or kind, self.text, tok[1]))
+        self.pos += 1
+        return tok
+
+    def parse(self):
+        node = self.parse_gate(0)
+        if self.peek()[0] is not None:
+            raise RuleError('unexpected [{}] in [{}]'.format(self.peek()[1], self.text))
+        return node
+
+    # binary operators by increasing precedence:
+    _LEVELS = ('or', 'xor', 'and')
+
+    def parse_gate(self, level):
+        if level == len(self._LEVELS):
+            return self.parse_not()
+
+        gate = self._LEVELS[level]
+        operands = [self.parse_gate(level + 1)]
+        while self.peek() == ('kw', gate):
+            self.take()
+            operands.append(self.parse_gate(level + 1))
+        return operands[0] if len(operands) == 1 else (gate, tuple(operands))
+
+    def parse_not(self):
+        if self.peek() == ('kw', 'not'):
+            self.take()
+            return ('not', self.parse_not())
+        if self.peek() == ('paren', '('):
+            self.take()
+            node = self.parse_gate(0)
+            self.take('paren', ')')
+            return node
+        return self.parse_comparison()
+
+    def parse_comparison(self):
+        metric = self.take('word')[1]
+        if metric not in self.metrics:
+            raise RuleError('unknown metric [{}] in [{}]'.format(metric, self.text))
+        op = self.take('op')[1]
+        kind, value = self.peek()
+        if kind not in ('num', 'str', 'word'):
+            raise RuleError('expected value after [{} {}] in [{}]'.format(metric, op, self.text))
+        self.take()
+        value = float(value) if kind == 'num' else value.lower()
+        try:
+            check_comparison(metric, op, value)
+        except RuleError as e:
+            raise RuleError('{} in [{}]'.format(e, self.text))
+        return ('cmp', metric, op, value)
+
+
+def parse_expression(text, metrics):
+    """Parses rule expression string into AST; raises RuleError if invalid"""
+    return _Parser(text, metrics).parse()
+
+
+def fold(terms):
+    """Folds [(gate, node), ...] terms left-to-right into single AST node; note
+    gate of the first term is ignored."""
+    if not terms:
+        return NEVER
+
+    node = terms[0][1]
+    for gate, operand in terms[1:]:
+        if gate not in GATES:
+            raise RuleError('unknown logical operator [{}]'.format(gate))
+        node = (gate, (node, operand))
+    return node
+
+
+def rule_set_terms(rules, metrics):
+    """Returns [(gate, node), ...] terms for a tracker/label rule set, being either
+    a single expression string or a list of triples and/or expression strings;
+    expressions are joined to preceding terms with 'and', triples w/ their own gate."""
+    if isinstance(rules, str):
+        rules = [rules]
+
+    terms = []
+    for rule in rules:
+        if isinstance(rule, str):
+            terms.append(('and', parse_expression(rule, metrics)))
+            continue
+
+        (gate, func, value) = rule
+        if func not in metrics:
+            raise RuleError('unknown metric [{}]'.format(func))
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            raise RuleError('[{}] rule value [{}] is not a number'.format(func, value))
+        check_comparison(func, '>=', value)
+        terms.append((gate, ('cmp', func, '>=', value)))
+    return terms
+
+
+def general_rule(config, metrics):
+    """Returns AST node of the general filter/filter2 rule defined in config"""
+    f1 = config['filter'] if config['filter'] in metrics else 'func_ratio'
+    f2 = config['filter2'] if config['filter2'] in metrics else 'func_ratio'
+    terms = []
+    if config['rule_1_enabled']:
+        terms.append(('and', ('cmp', f1, '>=', float(config['min']))))
+    if config['rule_2_enabled']:
+        terms.append((config['sel_func'], ('cmp', f2, '>=', float(config['min2']))))
+    for gate, (kind, metric, op, value) in terms:
+        check_comparison(metric, op, value)
+    return fold(terms)
+
+
+def node_metrics(node):
+    """Returns set of metrics referenced by given AST node"""
+    kind = node[0]
+    if kind == 'cmp':
+        return {node[1]}
+    if kind == 'not':
+        return node_metrics(node[1])
+    if kind in GATES:
+        return set().union(*(node_metrics(n) for n in node[1]))
+    return set()
+
+
+def node_comparisons(node):
+    """Returns list of (metric, operator, value) comparisons in given AST node"""
+    kind = node[0]
+    if kind == 'cmp':
+        return [node[1:]]
+    if kind == 'not':
+        return node_comparisons(node[1])
+    if kind in GATES:
+        return [c for n in node[1] for c in node_comparisons(n)]
+    return []
+
+
+def node_cost(node, costs):
+    """Returns cost of evaluating given AST node, i.e. sum of costs of the
+    metrics it reads; metrics w/o a cost cost 1"""
+    return sum(costs.get(m, 1) for m in node_metrics(node))
+
+
+def order_by_cost(node, costs):
+    """Returns AST node w/ nested and/or chains flattened, and their operands
+    sorted by increasing cost (ties keep their order); xor operands are all
+    evaluated anyway, so they're left in place."""
+    kind = node[0]
+    if kind == 'not':
+        return ('not', order_by_cost(node[1], costs))
+    if kind not in GATES:
+        return node
+
+    operands = []
+    for n in node[1]:
+        n = order_by_cost(n, costs)
+        if kind != 'xor' and n[0] == kind:
+            operands.extend(n[1])
+        else:
+            operands.append(n)
+    if kind != 'xor':
+        operands.sort(key=lambda n: node_cost(n, costs))
+    return (kind, tuple(operands))
+
+
+def to_string(node):
+    """Renders AST node back into expression form, e.g. for logging"""
+    kind = node[0]
+    if kind == 'cmp':
+        return '{} {} {}'.format(*node[1:])
+    if kind == 'not':
+        return 'not ({})'.format(to_string(node[1]))
+    if kind in GATES:
+        return ' {} '.format(kind).join('({})'.format(to_string(n)) for n in node[1])
+    return str(node[1])
+
+
+def _emit(node):
+    kind = node[0]
+
+    if kind == 'cmp':
+        (_, metric, op, value) = node
+        compare = COMPARISONS[op]
+
+        def cmp(get):
+            current = get(metric)
+            return None if current is None else compare(current, value)
+        return cmp
+
+    if kind == 'not':
+        inner = _emit(node[1])
+
+        def negate(get):
+            result = inner(get)
+            return None if result is None else not result
+        return negate
+
+    if kind in GATES:
+        operands = [_emit(n) for n in node[1]]
+        if kind in ('and', 'or'):
+            # short-circuits on false for and, true for or; unknown otherwise
+            # only decides if nothing else does:
+            decisive = kind == 'or'
+
+            def gate(get):
+                result = not decisive
+                for f in operands:
+                    r = f(get)
+                    if r is None:
+                        result = None
+                    elif bool(r) == decisive:
+                        return decisive
+                return result
+            return gate
+
+        def xor(get):
+            results = [f(get) for f in operands]
+            if any(r is None for r in results):
+                return None
+            return functools.reduce(operator.xor, (bool(r) for r in results))
+        return xor
+
+    value = bool(node[1])
+    return lambda get: value
+
+
+class CompiledRule(object):
+    """Removal rule compiled into closures; call w/ `get(metric_name)` callable
+    to evaluate it for a torrent. If metric costs are given, and/or operands
+    are evaluated in order of increasing cost."""
+
+    def __init__(self, node, costs=None):
+        self.node = node
+        self.metrics = node_metrics(node)
+        self.comparisons = node_comparisons(node)
+        self._eval = _emit(order_by_cost(node, costs) if costs else node)
+
+    def __call__(self, get):
+        return bool(self._eval(get))  # unknown (None) is false
+
+    def __str__(self):
+        return to_string(self.node)
@@ -0,0 +1,185 @@
+#
+# scanplan.py
+#
+# Copyright (C) 2026 Laur <layr@hot.ee>
+#
+# Deluge is free software.
+#
+# You may redistribute it and/or modify it under the terms of the
+# GNU General Public License, as published by the Free Software
+# Foundation; either version 3 of the License, or (at your option)
+# any later version.
+#
+# deluge is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with deluge.    If not, write to:
+#   The Free Software Foundation, Inc.,
+#   51 Franklin Street, Fifth Floor
+#   Boston, MA  02110-1301, USA.
+#
+#    In addition, as a special exception, the copyright holders give
+#    permission to link the code of portions of this program with the OpenSSL
+#    library.
+#    You must obey the GNU General Public License in all respects for all of
+#    the code used other than OpenSSL. If you modify file(s) with this
+#    exception, you may extend this exception to your version of the file(s),
+#    but you are not obligated to do so. If you do not wish to do so, delete
+#    this exception statement from your version. If you delete this exception
+#    statement from all source files in the program, then also delete it here.
+#
+
+import time
+
+from twisted.internet import reactor
+from twisted.internet.task import deferLater
+
+
+class _Phase(object):
+    __slots__ = ('timer', 'name')
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.timer._enter(self.name)
+
+    def __exit__(self, *exc):
+        self.timer._exit()
+
+
+class PhaseTimer(object):
+    """Accumulates wall-clock time spent in named scan phases; a phase may be
+    entered any number of times.
+
+    Phases may be nested, in which case time spent in the inner phase is not
+    counted towards the outer one, i.e. durations always add up to the total.
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.durations = {}
+        self._phases = {}
+        self._stack = []
+        self._since = 0.0
+
+    def phase(self, name):
+        """Returns context manager timing the named phase"""
+        try:
+            return self._phases[name]
+        except KeyError:
+            p = self._phases[name] = _Phase(self, name)
+            return p
+
+    def _charge(self, now):
+        name = self._stack[-1]
+        self.durations[name] = self.durations.get(name, 0.0) + now - self._since
+        self._since = now
+
+    def _enter(self, name):
+        now = self.clock()
+        if self._stack:
+            self._charge(now)  # pause the outer phase
+        self._since = now
+        self._stack.append(name)
+
+    def _exit(self):
+        self._charge(self.clock())
+        self._stack.pop()
+
+    def total(self):
+        return sum(self.durations.values())
+
+
+class Slicer(object):
+    """Splits a scan's loops into time slices of about budget seconds, letting
+    the reactor serve RPCs & events in between. Loops call due() once per item,
+    and await pause() whenever it returns True:
+
+        for item in items:
+            if slicer.due():
+                await slicer.pause()
+            ...
+
+    Time spent waiting for the reactor is timed as 'yield' phase. Note torrents
+    may be added or removed while the scan is paused.
+    """
+
+    def __init__(self, budget, timer, clock=time.perf_counter):
+        self.budget = budget  # <= 0 never yields
+        self.slices = 1
+        self._timer = timer
+        self._clock = clock
+        self._started = clock()
+
+    def due(self):
+        return self.budget > 0 and self._clock() - self._started >= self.budget
+
+    async def pause(self):
+        with self._timer.phase('yield'):
+            await deferLater(reactor, 0, lambda: None)
+        self.slices += 1
+        self._started = self._clock()
+
+
+# counters every scan keeps:
+COUNTERS = [
+    'torrents',             # torrents seen
+    'finished',             # finished & not exempt, i.e. eviction candidates
+    'exempt',               # finished, but ignored or exempt by tracker/label
+    'max_seeds',            # candidates allowed to stay, after count_exempt
+    'evaluated',            # candidates whose remove rule was evaluated
+    'metric_reads',         # metric values read by rule evaluation
+    'metric_reads_skipped', # metric values rules didn't need to read, thanks to short-circuiting
+    'status_fetches',       # torrent status records read
+    'planned_removals',
+    'removed',
+    'paused',
+    'reannounce_failures',
+    'remove_failures',
+    'slices'                # time slices the scan's planning was split into
+]
+
+
+class ScanPlan(object):
+    """State of a single scan: the config & compiled rules it runs against,
+    counters and phase timings, and torrents it decided to pause or remove,
+    in eviction order.
+
+    If record is set, every evaluated candidate is also described in entries,
+    along with the metric values its rule was evaluated against."""
+
+    def __init__(self, config, rules, record=False):
+        self.config = config
+        self.rules = rules
+        self.labels_enabled = False
+        self.labels = None  # LabelMap, if labels are needed
+        self.pause = []   # [(id, torrent), ...]
+        self.remove = []  # [(id, torrent), ...]
+        self.entries = [] if record else None
+        self.volumes = {}  # id -> Volume of torrents whose free space was checked
+        self.freed = {}  # id -> bytes removing torrent is expected to free up
+        self.deadlines = []  # [(time, id), ...] kept torrents are expected to become eligible at
+        self.counts = dict((c, 0) for c in COUNTERS)
+        self.stop_reason = None
+        self.timer = PhaseTimer()
+        self.slicer = Slicer(config['scan_slice_ms'] / 1000.0, self.timer)
+
+    def record(self, **entry):
+        if self.entries is not None:
+            entry['rank'] = len(self.entries) + 1
+            self.entries.append(entry)
+
+    def to_dict(self):
+        """Returns plan as plain data, e.g. for returning over RPC"""
+        return {
+            'plan': self.entries or [],
+            'counts': self.counts,
+            'stop_reason': self.stop_reason,
+            'timings': dict(self.timer.durations, total=self.timer.total())
+        }
+
@@ -0,0 +1,153 @@
+#
+# scanstats.py
+#
+# Copyright (C) 2026 Laur <layr@hot.ee>
+#
+# Deluge is free software.
+#
+# You may redistribute it and/or modify it under the terms of the
+# GNU General Public License, as published by the Free Software
+# Foundation; either version 3 of the License, or (at your option)
+# any later version.
+#
+# deluge is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with deluge.    If not, write to:
+#   The Free Software Foundation, Inc.,
+#   51 Franklin Street, Fifth Floor
+#   Boston, MA  02110-1301, USA.
+#
+#    In addition, as a special exception, the copyright holders give
+#    permission to link the code of portions of this program with the OpenSSL
+#    library.
+#    You must obey the GNU General Public License in all respects for all of
+#    the code used other than OpenSSL. If you modify file(s) with this
+#    exception, you may extend this exception to your version of the file(s),
+#    but you are not obligated to do so. If you do not wish to do so, delete
+#    this exception statement from your version. If you delete this exception
+#    statement from all source files in the program, then also delete it here.
+#
+
+from collections import deque
+import os
+
+from .scanplan import COUNTERS
+
+# upper bounds of scan duration histogram buckets, in seconds:
+DURATION_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+# counters accumulated over all scans; rest are only meaningful per scan:
+TOTALS = ['evaluated', 'metric_reads', 'metric_reads_skipped', 'status_fetches', 'planned_removals', 'removed', 'paused', 'reannounce_failures', 'remove_failures', 'slices']
+
+
+def _label_value(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+class ScanStats(object):
+    """Aggregates counters & phase timings of completed scans: totals since the
+    plugin was enabled, the last scan, a window of recent scans and a histogram
+    of scan durations."""
+
+    def __init__(self, history=50):
+        self.scans = 0
+        self.totals = dict((c, 0) for c in TOTALS)
+        self.phase_totals = {}
+        self.recent = deque(maxlen=history)
+        self.buckets = [0] * len(DURATION_BUCKETS)  # note counts aren't cumulative here
+        self.duration_sum = 0.0
+
+    def add(self, plan, started, duration):
+        """Records a completed scan"""
+        self.scans += 1
+        self.duration_sum += duration
+        for i, le in enumerate(DURATION_BUCKETS):
+            if duration <= le:
+                self.buckets[i] += 1
+                break
+
+        for c in TOTALS:
+            self.totals[c] += plan.counts.get(c, 0)
+        for phase, sec in plan.timer.durations.items():
+            self.phase_totals[phase] = self.phase_totals.get(phase, 0.0) + sec
+
+        self.recent.append({
+            'time': started,
+            'duration': duration,
+            'stop_reason': plan.stop_reason,
+            'counts': dict(plan.counts),
+            'timings': dict(plan.timer.durations)
+        })
+
+    def last(self):
+        return self.recent[-1] if self.recent else None
+
+    def histogram(self):
+        """Returns [(upper bound, cumulative count), ...], last bound being '+Inf'"""
+        result = []
+        count = 0
+        for le, n in zip(DURATION_BUCKETS, self.buckets):
+            count += n
+            result.append((str(le), count))
+        result.append(('+Inf', self.scans))
+        return result
+
+    def to_dict(self):
+        return {
+            'scans': self.scans,
+            'totals': dict(self.totals),
+            'phase_totals': dict(self.phase_totals),
+            'last': self.last(),
+            'recent': list(self.recent),
+            'duration_histogram': {
+                'buckets': [list(b) for b in self.histogram()],
+                'sum': self.duration_sum,
+                'count': self.scans
+            }
+        }
+
+    def to_prometheus(self):
+        """Returns stats in Prometheus text exposition format"""
+        lines = []
+
+        def metric(name, kind, doc, samples):
+            lines.append('# HELP autoremoveplus_{} {}'.format(name, doc))
+            lines.append('# TYPE autoremoveplus_{} {}'.format(name, kind))
+            for labels, value in samples:
+                label_str = ','.join('{}="{}"'.format(k, _label_value(v)) for k, v in labels)
+                lines.append('autoremoveplus_{}{} {}'.format(name, '{' + label_str + '}' if label_str else '', float(value)))
+
+        lines.append('# HELP autoremoveplus_scan_duration_seconds Duration of completed scans.')
+        lines.append('# TYPE autoremoveplus_scan_duration_seconds histogram')
+        for le, n in self.histogram():
+            lines.append('autoremoveplus_scan_duration_seconds_bucket{{le="{}"}} {}'.format(le, float(n)))
+        lines.append('autoremoveplus_scan_duration_seconds_sum {}'.format(float(self.duration_sum)))
+        lines.append('autoremoveplus_scan_duration_seconds_count {}'.format(float(self.scans)))
+
+        metric('scan_phase_seconds_total', 'counter', 'Time spent in each scan phase.',
+               [((('phase', p),), sec) for p, sec in sorted(self.phase_totals.items())])
+        metric('scan_torrents_total', 'counter', 'Torrents evaluated, removed, etc. over all scans.',
+               [((('counter', c),), self.totals[c]) for c in TOTALS])
+
+        last = self.last()
+        if last is not None:
+            metric('last_scan_timestamp_seconds', 'gauge', 'Start time of the last scan.', [((), last['time'])])
+            metric('last_scan_duration_seconds', 'gauge', 'Duration of the last scan.', [((), last['duration'])])
+            metric('last_scan_phase_seconds', 'gauge', 'Time the last scan spent in each phase.',
+                   [((('phase', p),), sec) for p, sec in sorted(last['timings'].items())])
+            metric('last_scan_torrents', 'gauge', 'Torrent counters of the last scan.',
+                   [((('counter', c),), last['counts'].get(c, 0)) for c in COUNTERS])
+
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path):
+        """Writes stats for Prometheus node_exporter's textfile collector; the file
+        is replaced atomically, so the collector never reads a partial one."""
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, path)
@@ -0,0 +1,98 @@
+#
+# selection.py
+#
+# Copyright (C) 2026 Laur <layr@hot.ee>
+#
+# Deluge is free software.
+#
+# You may redistribute it and/or modify it under the terms of the
+# GNU General Public License, as published by the Free Software
+# Foundation; either version 3 of the License, or (at your option)
+# any later version.
+#
+# deluge is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with deluge.    If not, write to:
+#   The Free Software Foundation, Inc.,
+#   51 Franklin Street, Fifth Floor
+#   Boston, MA  02110-1301, USA.
+#
+#    In addition, as a special exception, the copyright holders give
+#    permission to link the code of portions of this program with the OpenSSL
+#    library.
+#    You must obey the GNU General Public License in all respects for all of
+#    the code used other than OpenSSL. If you modify file(s) with this
+#    exception, you may extend this exception to your version of the file(s),
+#    but you are not obligated to do so. If you do not wish to do so, delete
+#    this exception statement from your version. If you delete this exception
+#    statement from all source files in the program, then also delete it here.
+#
+
+import heapq
+
+
+class _Inverted(object):
+    """Heap entry ordering in reverse, turning heapq's min-heap into a max-heap"""
+    __slots__ = ('entry',)
+
+    def __init__(self, entry):
+        self.entry = entry
+
+    def __lt__(self, other):
+        return other.entry < self.entry
+
+
+def _pop_max(entries, count):
+    """Yields count highest of entries (list, reordered in place), highest first"""
+    if hasattr(heapq, 'heapify_max'):
+        # max-heap primitives became public in python 3.14, and are implemented in C:
+        heapq.heapify_max(entries)
+        for _ in range(count):
+            yield heapq.heappop_max(entries)
+    else:
+        heap = list(map(_Inverted, entries))
+        heapq.heapify(heap)
+        for _ in range(count):
+            yield heapq.heappop(heap).entry
+
+
+def sort_value(value):
+    """Sort key of a metric value; None (no value, e.g. upload history doesn't
+    cover the metric's window yet) sorts lowest, i.e. is evicted last"""
+    return float('-inf') if value is None else value
+
+
+def eviction_candidates(items, key, keep):
+    """Lazily yields items in removal order, i.e. highest key first; see
+    eviction_order()."""
+    if len(items) <= max(keep, 0):
+        return
+    for idx in eviction_order(list(map(key, items)), keep):
+        yield items[idx]
+
+
+def eviction_order(keys, keep):
+    """Lazily yields indexes of keys in removal order, i.e. highest key first.
+
+    Produces the same sequence as
+
+        items.sort(key=key)
+        reversed(items[keep:])
+
+    (as indexes into the items keys were computed from) but only heapifies
+    the keys (O(n)) and pays O(log n) per candidate actually consumed, so
+    callers that stop early (e.g. once enough disk space has been freed) never
+    pay for sorting the whole list. Ties are broken by original position,
+    matching the stable sort.
+    """
+    count = len(keys) - max(keep, 0)
+    if count <= 0:
+        return
+
+    heap = list(zip(keys, range(len(keys))))
+    for key, idx in _pop_max(heap, count):
+        yield idx
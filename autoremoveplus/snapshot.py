@@ -0,0 +1,158 @@
+#
+# snapshot.py
+#
+# Copyright (C) 2026 Laur <layr@hot.ee>
+#
+# Deluge is free software.
+#
+# You may redistribute it and/or modify it under the terms of the
+# GNU General Public License, as published by the Free Software
+# Foundation; either version 3 of the License, or (at your option)
+# any later version.
+#
+# deluge is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with deluge.    If not, write to:
+#   The Free Software Foundation, Inc.,
+#   51 Franklin Street, Fifth Floor
+#   Boston, MA  02110-1301, USA.
+#
+#    In addition, as a special exception, the copyright holders give
+#    permission to link the code of portions of this program with the OpenSSL
+#    library.
+#    You must obey the GNU General Public License in all respects for all of
+#    the code used other than OpenSSL. If you modify file(s) with this
+#    exception, you may extend this exception to your version of the file(s),
+#    but you are not obligated to do so. If you do not wish to do so, delete
+#    this exception statement from your version. If you delete this exception
+#    statement from all source files in the program, then also delete it here.
+#
+
+import logging
+import time
+
+log = logging.getLogger(__name__)
+
+
+def fetch_status(tid, torrent, keys, now):
+    """Default status source: one (refreshing) get_status() call per torrent."""
+    return torrent.get_status(keys, update=True)
+
+
+class ScanSnapshot(object):
+    """Memoized torrent status records for the duration of a single scan.
+
+    Filters read their values from the record fetched here, so a torrent's
+    status is requested at most once per scan no matter how many times it's
+    sorted on or evaluated against rules.
+    """
+
+    def __init__(self, keys, fetch=fetch_status, now=None, extra=None):
+        self.keys = list(keys)
+        self.extra = extra or {}  # status key -> function(tid) of values served by the plugin itself
+        self.now = time.time() if now is None else now
+        self.fetches = 0
+        self._fetch = fetch
+        self._records = {}
+        self._failed = set()  # tids whose status couldn't be fetched
+
+    def status(self, tid, torrent):
+        try:
+            return self._records[tid]
+        except KeyError:
+            pass
+
+        try:
+            st = self._fetch(tid, torrent, self.keys, self.now)
+        except Exception as e:
+            log.debug("Unable to get torrent [%s] status: %s", tid, e)
+            st = {}
+            self._failed.add(tid)
+        for key, get in self.extra.items():
+            st[key] = get(tid)
+
+        self.fetches += 1
+        self._records[tid] = st
+        return st
+
+    def has_status(self, tid, torrent):
+        """Whether torrent's status record could be fetched, i.e. isn't empty"""
+        self.status(tid, torrent)
+        return tid not in self._failed
+
+    def value(self, func, tid, torrent):
+        """Evaluate filter func against the torrent's memoized status record"""
+        return func(self.status(tid, torrent), self.now)
+
+
+class StatusTable(object):
+    """Plugin-side table of torrent status records, kept up to date in bulk.
+
+    Deluge requests status updates for the whole session via libtorrent's
+    post_torrent_updates(); the resulting state_update_alert only carries
+    torrents whose status changed since the previous post. We only mark
+    those as changed, so a scan re-reads O(changed torrents) records and
+    serves the rest from the table.
+
+    Records are read from Deluge's own torrent status (already refreshed from
+    the alert by TorrentManager), so they contain exactly what get_status()
+    would have returned. Counters that keep growing without libtorrent
+    reporting a status change are extrapolated from the time of the read.
+    """
+
+    def __init__(self):
+        self.keys = []
+        self._records = {}  # tid -> (read timestamp, status)
+        self._changed = set()
+
+    def set_keys(self, keys):
+        """Set status keys to track; table is reset if they differ from current ones."""
+        keys = sorted(set(keys) | {'state'})  # state is needed for extrapolating seeding_time
+        if keys != self.keys:
+            log.debug("StatusTable: status keys changed to %s, resetting table", keys)
+            self.keys = keys
+            self._records.clear()
+            self._changed.clear()
+
+    def covers(self, keys):
+        """Whether the table already tracks all of the given status keys"""
+        return bool(self.keys) and set(keys) <= set(self.keys)
+
+    def mark_changed(self, tids):
+        self._changed.update(tids)
+
+    def discard(self, tid):
+        self._records.pop(tid, None)
+        self._changed.discard(tid)
+
+    def clear(self):
+        self._records.clear()
+        self._changed.clear()
+
+    def fetch(self, tid, torrent, keys, now):
+        """Status source for ScanSnapshot reading from the table; note table
+        keys (see set_keys()) are a superset of the passed keys."""
+        entry = self._records.get(tid)
+        if entry is None or tid in self._changed:
+            # torrent's status was either never read, or deluge has already
+            # applied the changed status from state_update_alert:
+            st = torrent.get_status(self.keys, update=entry is None)
+            self._changed.discard(tid)
+            self._records[tid] = (now, st)
+            return st
+
+        (read_at, st) = entry
+        elapsed = now - read_at
+        if elapsed <= 0:
+            return st
+
+        st = dict(st)
+        if st.get('time_since_transfer', -1) >= 0:
+            st['time_since_transfer'] += elapsed
+        if 'seeding_time' in st and st['state'] == 'Seeding':
+            st['seeding_time'] += elapsed
+        return st
@@ -0,0 +1,123 @@
+#
+# statestore.py
+#
+# Copyright (C) 2026 Laur <layr@hot.ee>
+#
+# Deluge is free software.
+#
+# You may redistribute it and/or modify it under the terms of the
+# GNU General Public License, as published by the Free Software
+# Foundation; either version 3 of the License, or (at your option)
+# any later version.
+#
+# deluge is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with deluge.    If not, write to:
+#   The Free Software Foundation, Inc.,
+#   51 Franklin Street, Fifth Floor
+#   Boston, MA  02110-1301, USA.
+#
+#    In addition, as a special exception, the copyright holders give
+#    permission to link the code of portions of this program with the OpenSSL
+#    library.
+#    You must obey the GNU General Public License in all respects for all of
+#    the code used other than OpenSSL. If you modify file(s) with this
+#    exception, you may extend this exception to your version of the file(s),
+#    but you are not obligated to do so. If you do not wish to do so, delete
+#    this exception statement from your version. If you delete this exception
+#    statement from all source files in the program, then also delete it here.
+#
+
+import logging
+import sqlite3
+
+from twisted.internet import reactor
+
+log = logging.getLogger(__name__)
+
+
+class IgnoreStore(object):
+    """Set of ignored (exempted from removal) torrent ids, persisted to SQLite.
+
+    Lookups & updates only touch the in-memory set, i.e. are O(k) in number
+    of ids passed. Changes are written behind in batches, at most flush_delay
+    seconds after the first unsaved change. Only ignored ids are stored.
+    """
+
+    def __init__(self, path, flush_delay=5.0):
+        self.path = path
+        self.flush_delay = flush_delay
+        self._db = sqlite3.connect(path)
+        self._db.execute('CREATE TABLE IF NOT EXISTS ignored (torrent_id TEXT PRIMARY KEY)')
+        self._db.commit()
+        self._ignored = {row[0] for row in self._db.execute('SELECT torrent_id FROM ignored')}
+        self._dirty = {}  # torrent id -> ignore
+        self._flush_call = None
+
+    def __len__(self):
+        return len(self._ignored)
+
+    def is_ignored(self, tid):
+        return tid in self._ignored
+
+    def get(self, tids):
+        return [t in self._ignored for t in tids]
+
+    def set(self, tids, ignore=True):
+        for t in tids:
+            if ignore:
+                self._ignored.add(t)
+            else:
+                self._ignored.discard(t)
+            self._dirty[t] = bool(ignore)
+        self._schedule_flush()
+
+    def discard(self, tid):
+        if tid in self._ignored:
+            self.set([tid], False)
+
+    def retain(self, tids):
+        """Garbage-collects ids not in tids, e.g. of torrents removed while we
+        weren't running"""
+        orphans = self._ignored.difference(tids)
+        if orphans:
+            log.debug("IgnoreStore: dropping %d orphaned ids", len(orphans))
+            self.set(orphans, False)
+
+    def _schedule_flush(self):
+        if self._flush_call is None or not self._flush_call.active():
+            self._flush_call = reactor.callLater(self.flush_delay, self.flush)
+
+    def flush(self):
+        if self._flush_call is not None and self._flush_call.active():
+            self._flush_call.cancel()
+        self._flush_call = None
+
+        if not self._dirty:
+            return
+
+        dirty, self._dirty = self._dirty, {}
+        try:
+            with self._db:
+                self._db.executemany(
+                    'INSERT OR IGNORE INTO ignored (torrent_id) VALUES (?)',
+                    [(t,) for t, ignore in dirty.items() if ignore]
+                )
+                self._db.executemany(
+                    'DELETE FROM ignored WHERE torrent_id = ?',
+                    [(t,) for t, ignore in dirty.items() if not ignore]
+                )
+            log.debug("IgnoreStore: flushed %d changes", len(dirty))
+        except sqlite3.Error as e:
+            log.error("IgnoreStore: failed to save ignore states to [%s]: %s", self.path, e)
+            dirty.update(self._dirty)
+            self._dirty = dirty
+            self._schedule_flush()
+
+    def close(self):
+        self.flush()
+        self._db.close()
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+#
+# bench_scan.py
+#
+# Measures the cost of a periodic_scan() decision pass (Core.plan_scan(), i.e.
+# everything up to the actual pause/remove calls) against synthetic torrent
+# populations, using local stand-ins for TorrentManager, Torrent, the Label &
+# LabelPlus plugins and the free space source, and a simulated clock.
+#
+# For every filter combination it reports the first scan after a config change
+# (cold; includes resolving exemptions & rules of every torrent), the median of
+# subsequent scans (warm), per-phase breakdown of the warm scans and peak
+# memory allocated during a scan.
+#
+# usage, from project root (needs the plugin's runtime deps, i.e. deluge, installed):
+#   $ python benchmarks/bench_scan.py [--sizes 1000,10000] [--mode torrent|bulk|both] [--all-pairs]
+#       [--executor reactor|thread] [--shared-data]
+#
+
+import argparse
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import deluge.configmanager  # noqa: E402
+from twisted.internet import defer, task  # noqa: E402
+
+from autoremoveplus import core as core_module  # noqa: E402
+
+SIM_START = 1700000000.0  # simulated clock's epoch
+SCAN_INTERVAL = 1800.0  # simulated seconds between scans
+GIB = 1024 ** 3
+
+TRACKERS = ['https://tracker{}.example.org:443/announce'.format(i) for i in range(40)]
+LABELS = ['movies', 'tv', 'music', 'books', 'games', 'linux', 'keep', 'archive',
+          'software', 'anime', 'docs', 'podcasts', 'sports', 'misc', 'private']
+NON_NUMERIC = {'func_state'}
+PHASES = ['collect', 'exempt', 'labels', 'snapshot', 'inodes', 'sort', 'free_space', 'match', 'evaluate', 'worker',
+          'deadlines', 'plan']
+
+
+def zipf_choice(rnd, items, s=1.1):
+    """Picks from items w/ probability falling off by rank, as real trackers & labels do"""
+    weights = [1.0 / (rank + 1) ** s for rank in range(len(items))]
+    return rnd.choices(items, weights)[0]
+
+
+class SimClock(object):
+
+    def __init__(self, now=SIM_START):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, sec):
+        self.now += sec
+
+
+class FakeTorrent(object):
+    """Stand-in for deluge.core.torrent.Torrent"""
+
+    def __init__(self, torrent_id, trackers, status, finished, files):
+        self.torrent_id = torrent_id
+        self.trackers = [{'url': url} for url in trackers]
+        self.is_finished = finished
+        self.status = status
+        self.files = files
+        self.options = {'download_location': ''}
+        self.handle = None
+
+    def get_files(self):
+        return [{'path': path, 'size': 0} for path in self.files]
+
+    def get_status(self, keys, update=False):
+        st = self.status
+        return dict((k, st[k]) for k in keys if k in st)
+
+    def pause(self):
+        pass
+
+    def force_reannounce(self):
+        return True
+
+
+class FakeTorrentManager(object):
+    """Stand-in for deluge.core.torrentmanager.TorrentManager"""
+
+    def __init__(self, torrents):
+        self.torrents = dict((t.torrent_id, t) for t in torrents)
+        self.on_status_update = None
+
+    def get_torrent_list(self):
+        return list(self.torrents)
+
+    def torrents_status_update(self, torrent_ids, keys):
+        if self.on_status_update is not None:
+            self.on_status_update()
+        return defer.succeed({})
+
+
+class FakeLabel(object):
+    """Stand-in for the Label core plugin"""
+
+    def __init__(self, labels):
+        self.torrent_labels = labels
+
+    def _status_get_label(self, torrent_id):
+        return self.torrent_labels.get(torrent_id, '')
+
+
+class FakeLabelPlus(object):
+    """Stand-in for the LabelPlus core plugin"""
+
+    def __init__(self, labels):
+        self.torrent_labels = labels
+
+    def get_torrent_label_name(self, torrent_id):
+        return self.torrent_labels.get(torrent_id, '')
+
+
+class FakeCore(object):
+    """Stand-in for deluge.core.core.Core as the free space source"""
+
+    def get_free_space(self, path=None):
+        return 500 * GIB
+
+
+class FakeHandlerRegistry(object):
+    """Stand-in for AlertManager, EventManager & CorePluginManager"""
+
+    def __init__(self, enabled_plugins):
+        self.enabled_plugins = enabled_plugins
+
+    def register_handler(self, alert, handler):
+        pass
+
+    def deregister_handler(self, handler):
+        pass
+
+    def register_event_handler(self, event, handler):
+        pass
+
+    def deregister_event_handler(self, event, handler):
+        pass
+
+    def register_status_field(self, field, func):
+        pass
+
+    def deregister_status_field(self, field):
+        pass
+
+    def get_enabled_plugins(self):
+        return self.enabled_plugins
+
+
+class FakeComponents(object):
+    """Stand-in for deluge.component, as far as core.py uses it"""
+
+    def __init__(self, components):
+        self.components = components
+
+    def get(self, name):
+        return self.components[name]
+
+
+class FakeTorrentStatus(object):
+    def __init__(self, info_hash):
+        self.info_hash = info_hash
+
+
+class FakeStateUpdateAlert(object):
+    def __init__(self, torrent_ids):
+        self.status = [FakeTorrentStatus(i) for i in torrent_ids]
+
+
+def generate_torrents(n, rnd, now):
+    """Returns ([FakeTorrent, ...], {torrent_id: label}) w/ roughly real-world distributions"""
+    torrents = []
+    labels = {}
+    for i in range(n):
+        tid = '{:040x}'.format(rnd.getrandbits(160))
+        finished = rnd.random() < 0.9
+        age_sec = min(rnd.expovariate(1 / 120.0), 1500) * 86400
+        if finished:
+            state = rnd.choices(['Seeding', 'Paused', 'Error', 'Queued'], [90, 7, 1, 2])[0]
+        else:
+            state = rnd.choice(['Downloading', 'Queued', 'Checking'])
+
+        status = {
+            'name': 'torrent-{}'.format(i),
+            'ratio': round(rnd.lognormvariate(0, 1), 4),
+            'time_added': now - age_sec,
+            'seeding_time': int(age_sec * rnd.uniform(0.2, 1.0)) if finished else 0,
+            'total_seeds': min(int(rnd.paretovariate(1.2)) - 1, 5000),
+            'distributed_copies': 0.0 if finished else round(rnd.uniform(0, 5), 3),
+            'time_since_transfer': -1 if rnd.random() < 0.05 else int(rnd.expovariate(1 / 86400.0)),
+            'last_seen_complete': 0 if rnd.random() < 0.1 else now - rnd.expovariate(1 / (48 * 3600.0)),
+            'state': state,
+            'progress': 100.0 if finished else round(rnd.uniform(0, 99.9), 2),
+            'total_done': int(rnd.lognormvariate(21.5, 1.2)),
+            'total_uploaded': 0,
+            'all_time_download': 0
+        }
+
+        trackers = [zipf_choice(rnd, TRACKERS)]
+        if rnd.random() < 0.1:
+            trackers.append(zipf_choice(rnd, TRACKERS))
+        if rnd.random() < 0.75:
+            labels[tid] = zipf_choice(rnd, LABELS)
+
+        # some torrents are cross-seeds of an earlier one, i.e. share its files:
+        if torrents and rnd.random() < 0.05:
+            files = rnd.choice(torrents).files
+        else:
+            files = ['torrent-{}/{}.bin'.format(i, j) for j in range(rnd.randint(1, 3))]
+
+        torrents.append(FakeTorrent(tid, trackers, status, finished, files))
+    return torrents, labels
+
+
+def create_files(torrents):
+    """Creates torrents' (empty) files in a temp dir, for the inodes phase to stat"""
+    data_dir = tempfile.mkdtemp(prefix='bench_scan-data-')
+    for t in torrents:
+        t.options['download_location'] = data_dir
+        for path in t.files:
+            path = os.path.join(data_dir, path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            open(path, 'ab').close()
+
+
+def base_config(n):
+    return {
+        'enabled': False,  # keeps the real periodic_scan() loop from removing anything
+        'max_seeds': int(n * 0.7),
+        'count_exempt': False,
+        'remove': True,
+        'remove_data': True,
+        'hdd_space': -1.0,  # evaluate rules of every candidate
+        'trackers': ['tracker3.example.org', 'tracker17.'],
+        'labels': ['keep', 'archive'],
+        'min': 1.0,
+        'min2': 30.0,
+        'sel_func': 'and',
+        'rule_1_enabled': True,
+        'rule_2_enabled': True,
+        'tracker_rules': {
+            'tracker0.example.org': [['and', 'func_ratio', 2.0], ['and', 'func_seed_time', 72.0]],
+            'tracker5.example.org': 'func_ratio >= 1 or func_added >= 60'
+        },
+        'label_rules': {
+            'tv': [['or', 'func_added', 30.0]],
+            'movies': 'func_ratio >= 1.5 and not func_state == paused'
+        }
+    }
+
+
+def setup_core(torrents, labels, labelplus, rnd, churn):
+    tm = FakeTorrentManager(torrents)
+    handlers = FakeHandlerRegistry(['LabelPlus' if labelplus else 'Label'])
+    core_module.component = FakeComponents({
+        'TorrentManager': tm,
+        'AlertManager': handlers,
+        'EventManager': handlers,
+        'CorePluginManager': handlers,
+        'CorePlugin.Label': FakeLabel(labels),
+        'CorePlugin.LabelPlus': FakeLabelPlus(labels),
+        'Core': FakeCore()
+    })
+
+    # CorePluginBase.__init__() registers w/ deluge's component registry & RPC
+    # server, neither of which is running here:
+    core = core_module.Core.__new__(core_module.Core)
+    core.enable()
+    core.clock = SimClock()
+
+    # emulate libtorrent reporting a share of torrents as changed between scans:
+    ids = list(tm.torrents)
+    tm.on_status_update = lambda: core.on_alert_state_update(
+        FakeStateUpdateAlert(rnd.sample(ids, int(len(ids) * churn))))
+    return core
+
+
+async def scan(core):
+    plan = await core.plan_scan(core.config, core.rules)
+    core.clock.advance(SCAN_INTERVAL)
+    return plan
+
+
+async def bench(core, config, runs):
+    for key, value in config.items():
+        core.config[key] = value
+    core.compile_config()
+
+    start = time.perf_counter()
+    await scan(core)
+    cold = time.perf_counter() - start
+
+    warm = []
+    phases = dict((p, 0.0) for p in PHASES)
+    for _ in range(runs):
+        start = time.perf_counter()
+        plan = await scan(core)
+        warm.append(time.perf_counter() - start)
+        for phase, sec in plan.timer.durations.items():
+            phases[phase] = phases.get(phase, 0.0) + sec / runs
+
+    tracemalloc.start()
+    await scan(core)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return cold, statistics.median(warm), phases, peak
+
+
+async def run(args):
+    deluge.configmanager.set_config_dir(tempfile.mkdtemp(prefix='bench_scan-'))
+    funcs = sorted(core_module.filter_funcs)
+    if args.all_pairs:
+        pairs = [(f1, f2) for f1 in funcs for f2 in funcs]
+    else:
+        pairs = [(f, 'func_added' if f == 'func_ratio' else 'func_ratio') for f in funcs]
+    modes = ['torrent', 'bulk'] if args.mode == 'both' else [args.mode]
+
+    print("{:>8} {:>8} {:>26} {:>26} {:>9} {:>9} {:>9}  {}".format(
+        'torrents', 'mode', 'filter', 'filter2', 'cold ms', 'warm ms', 'peak MiB', 'warm phases (ms)'))
+    for n in args.sizes:
+        rnd = random.Random(args.seed)
+        (torrents, labels) = generate_torrents(n, rnd, SIM_START)
+        if args.shared_data:
+            create_files(torrents)
+        core = setup_core(torrents, labels, args.labelplus, rnd, args.churn)
+        try:
+            for mode in modes:
+                for f1, f2 in pairs:
+                    # general rule compares filter values against numeric minimums:
+                    config = dict(base_config(n), filter=f1, filter2=f2, status_ingestion=mode, scan_executor=args.executor,
+                                  shared_data_aware=args.shared_data,
+                                  labelplus=args.labelplus, rule_1_enabled=f1 not in NON_NUMERIC,
+                                  rule_2_enabled=f2 not in NON_NUMERIC)
+                    (cold, warm, phases, peak) = await bench(core, config, args.runs)
+                    print("{:>8} {:>8} {:>26} {:>26} {:>9.1f} {:>9.1f} {:>9.2f}  {}".format(
+                        n, mode, f1, f2, cold * 1000, warm * 1000, peak / 1024.0 ** 2,
+                        ' '.join('{}={:.1f}'.format(p, phases[p] * 1000) for p in PHASES if p in phases)))
+        finally:
+            core.disable()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks periodic_scan() against synthetic torrents")
+    parser.add_argument('--sizes', type=lambda s: [int(n) for n in s.split(',')], default=[1000, 10000, 100000],
+                        help='comma-separated torrent counts (default: 1000,10000,100000)')
+    parser.add_argument('--mode', choices=['torrent', 'bulk', 'both'], default='both',
+                        help='status_ingestion mode(s) to benchmark')
+    parser.add_argument('--all-pairs', action='store_true',
+                        help='every filter/filter2 combination instead of every filter once')
+    parser.add_argument('--runs', type=int, default=5, help='warm scans per combination')
+    parser.add_argument('--churn', type=float, default=0.1,
+                        help='share of torrents reported changed between scans in bulk mode')
+    parser.add_argument('--executor', choices=['reactor', 'thread'], default='reactor',
+                        help='scan_executor to benchmark')
+    parser.add_argument('--shared-data', action='store_true',
+                        help='enable shared_data_aware; creates every torrent\'s files in a temp dir to stat. '
+                             'Files are only stat\'ed again after an hour, i.e. it shows in cold scans')
+    parser.add_argument('--labelplus', action='store_true', help='use LabelPlus instead of Label')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    task.react(lambda reactor: defer.ensureDeferred(run(args)))
+
+
+if __name__ == '__main__':
+    main()
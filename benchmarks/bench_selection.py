@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+#
+# bench_selection.py
+#
+# Compares the old full-sort eviction candidate selection against the lazy
+# heap-based eviction_candidates() used by periodic_scan().
+#
+# usage, from project root (needs the plugin's runtime deps, i.e. deluge, installed):
+#   $ python benchmarks/bench_selection.py [n_torrents ...]
+#
+
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from autoremoveplus.selection import eviction_candidates  # noqa: E402
+
+
+def full_sort(torrents, key, keep, consume):
+    torrents = list(torrents)
+    torrents.sort(key=key)
+    for n, t in enumerate(reversed(torrents[keep:])):
+        if n >= consume:
+            break
+
+
+def lazy_select(torrents, key, keep, consume):
+    for n, t in enumerate(eviction_candidates(torrents, key, keep)):
+        if n >= consume:
+            break
+
+
+def main(sizes):
+    rnd = random.Random(42)
+    key = lambda i_t: (i_t[1][0], i_t[1][1])  # (ratio, age in days)
+
+    print("{:>8} {:>8} {:>8} {:>12} {:>12} {:>8}".format('torrents', 'keep', 'consume', 'sort (ms)', 'heap (ms)', 'speedup'))
+    for n in sizes:
+        torrents = [(i, (round(rnd.uniform(0, 10), 4), round(rnd.uniform(0, 365), 4))) for i in range(n)]
+        for keep, consume in ((n - 300, 300), (n - 300, 20), (0, 20)):
+            runs = 5
+            t_sort = timeit.timeit(lambda: full_sort(torrents, key, keep, consume), number=runs) / runs
+            t_heap = timeit.timeit(lambda: lazy_select(torrents, key, keep, consume), number=runs) / runs
+            print("{:>8} {:>8} {:>8} {:>12.2f} {:>12.2f} {:>7.2f}x".format(
+                n, keep, consume, t_sort * 1000, t_heap * 1000, t_sort / t_heap))
+
+
+if __name__ == '__main__':
+    main([int(a) for a in sys.argv[1:]] or [10000, 100000])
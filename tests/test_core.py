@@ -0,0 +1,158 @@
+#
+# test_core.py
+#
+# Runs Core against local stand-ins for Deluge's components, as
+# benchmarks/bench_scan.py does.
+#
+# usage, from project root (needs the plugin's runtime deps, i.e. deluge, installed):
+#   $ python -m pytest tests
+#
+
+import deluge.configmanager
+import pytest
+from twisted.internet import defer
+
+from autoremoveplus import core as core_module
+from autoremoveplus.scanplan import Slicer
+
+TRACKER = 'https://tracker.example.org/announce'
+NOW = 1700000000.0
+
+
+class FakeTorrent(object):
+
+    def __init__(self, torrent_id, status):
+        self.torrent_id = torrent_id
+        self.trackers = [{'url': TRACKER}]
+        self.is_finished = True
+        self.status = status
+        self.options = {'download_location': ''}
+
+    def get_status(self, keys, update=False):
+        return dict((k, self.status[k]) for k in keys if k in self.status)
+
+
+class FakeTorrentManager(object):
+
+    def __init__(self, torrents):
+        self.torrents = dict((t.torrent_id, t) for t in torrents)
+
+    def get_torrent_list(self):
+        return list(self.torrents)
+
+    def torrents_status_update(self, torrent_ids, keys):
+        return defer.succeed({})
+
+
+class FakeHandlerRegistry(object):
+    """Stand-in for AlertManager, EventManager & CorePluginManager"""
+
+    def register_handler(self, alert, handler):
+        pass
+
+    def deregister_handler(self, handler):
+        pass
+
+    def register_event_handler(self, event, handler):
+        pass
+
+    def deregister_event_handler(self, event, handler):
+        pass
+
+    def register_status_field(self, field, func):
+        pass
+
+    def deregister_status_field(self, field):
+        pass
+
+    def get_enabled_plugins(self):
+        return []
+
+    def emit(self, event):
+        pass
+
+
+class FakeComponents(object):
+
+    def __init__(self, components):
+        self.components = components
+
+    def get(self, name):
+        return self.components[name]
+
+
+@pytest.fixture
+def core(tmp_path, monkeypatch):
+    deluge.configmanager.set_config_dir(str(tmp_path))
+    torrents = [FakeTorrent('{:040x}'.format(i), {
+        'name': 'torrent-{}'.format(i),
+        'ratio': 2.0,
+        'time_added': NOW - 86400.0 * 30,
+        'total_done': 1024
+    }) for i in range(10)]
+    handlers = FakeHandlerRegistry()
+    monkeypatch.setattr(core_module, 'component', FakeComponents({
+        'TorrentManager': FakeTorrentManager(torrents),
+        'AlertManager': handlers,
+        'EventManager': handlers,
+        'CorePluginManager': handlers
+    }))
+
+    # CorePluginBase.__init__() registers w/ deluge's component registry & RPC
+    # server, neither of which is running here:
+    c = core_module.Core.__new__(core_module.Core)
+    c.enable()
+    c.clock = lambda: NOW
+    for key, value in {
+        'enabled': False,  # keeps the interval loop from scanning
+        'incremental_scan': True,
+        'max_seeds': 0,
+        'filter': 'func_ratio',
+        'min': 1.0,
+        'rule_2_enabled': False
+    }.items():
+        c.config[key] = value
+    c.compile_config()
+    yield c
+    c.disable()
+
+
+def suspend_scans(monkeypatch):
+    """Makes scans yield on every torrent, until returned Deferred fires"""
+    gate = defer.Deferred()
+
+    async def pause(slicer):
+        await gate
+
+    monkeypatch.setattr(Slicer, 'due', lambda slicer: True)
+    monkeypatch.setattr(Slicer, 'pause', pause)
+    return gate
+
+
+def result(d):
+    out = []
+    d.addBoth(out.append)
+    assert out, 'scan did not finish'
+    if isinstance(out[0], Exception) or hasattr(out[0], 'raiseException'):
+        out[0].raiseException()
+    return out[0]
+
+
+def test_config_change_during_candidate_rescan(core, monkeypatch):
+    gate = suspend_scans(monkeypatch)
+    scan = core.plan_scan(core.config, core.rules)
+
+    # exempt every torrent's tracker while the scan is paused in collect_candidates():
+    core.set_config({'trackers': ['tracker.example.org']})
+    gate.callback(None)
+    assert len(result(scan).remove) == 10  # planned against the old config
+
+    plan = result(core.plan_scan(core.config, core.rules))
+    assert plan.remove == []
+    assert plan.counts['exempt'] == 10
+
+
+def test_incremental_scan_stores_candidates(core):
+    assert len(result(core.plan_scan(core.config, core.rules)).remove) == 10
+    assert core.candidates_synced == NOW
+    assert len(core.candidates) == 10
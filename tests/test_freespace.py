@@ -0,0 +1,67 @@
+#
+# test_freespace.py
+#
+# usage, from project root (needs the plugin's runtime deps, i.e. deluge, installed):
+#   $ python -m pytest tests
+#
+
+from autoremoveplus.freespace import GIB, FreeSpaceService, VolumeSpace
+
+
+class Disk(object):
+    def __init__(self, free):
+        self.free = free
+        self.now = 1000.0
+
+    def read(self):
+        return self.free
+
+    def clock(self):
+        return self.now
+
+
+def test_pending_reconciled_after_invalidate():
+    disk = Disk(100.0)
+    space = FreeSpaceService(disk.read, ttl=30.0, pending_ttl=600.0, clock=disk.clock)
+    assert space.free() == 100.0
+
+    space.note_freed(10 * GIB)
+    assert space.free() == 110.0  # cached reading + projection
+
+    # removal hits the disk, and the reading is forced before its ttl is up:
+    disk.free = 110.0
+    disk.now += 1
+    space.invalidate()
+    assert space.free() == 110.0
+    assert space.pending() == 0.0
+
+
+def test_partially_reflected_removal_stays_pending():
+    disk = Disk(100.0)
+    space = FreeSpaceService(disk.read, ttl=30.0, pending_ttl=600.0, clock=disk.clock)
+    space.free()
+    space.note_freed(10 * GIB)
+
+    disk.free = 104.0
+    space.invalidate()
+    assert space.free() == 110.0
+    assert space.pending() == 6.0
+
+
+def test_reset_keeps_pending_removals(tmp_path):
+    disk = Disk(100.0)
+    volumes = VolumeSpace(FreeSpaceService(disk.read, clock=disk.clock), free=lambda path: disk.free * GIB)
+    vol = volumes.volume(str(tmp_path))
+    assert vol.space.free() == 100.0
+    vol.space.note_freed(10 * GIB)
+
+    # e.g. config saved while removed data is still being deleted:
+    volumes.default.space.ttl = 5.0
+    volumes.reset()
+    vol = volumes.volume(str(tmp_path))
+    assert vol.space.free() == 110.0
+    assert vol.space.ttl == 5.0
+
+    disk.free = 110.0
+    volumes.invalidate()
+    assert vol.space.free() == 110.0
@@ -0,0 +1,55 @@
+#
+# test_rules.py
+#
+# usage, from project root (needs the plugin's runtime deps, i.e. deluge, installed):
+#   $ python -m pytest tests
+#
+
+import random
+
+import pytest
+
+from autoremoveplus.rules import CompiledRule, parse_expression
+
+METRICS = {'func_ratio': 'Ratio', 'func_seeders': 'Seeders', 'func_upload_24h': 'Uploaded in last 24h (GB)'}
+COSTS = {'func_ratio': 1, 'func_seeders': 10, 'func_upload_24h': 2}
+
+
+def compile_both(text):
+    node = parse_expression(text, METRICS)
+    return CompiledRule(node), CompiledRule(node, COSTS)
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('func_seeders >= 1 or func_upload_24h >= 1', True),
+    ('func_upload_24h >= 1 or func_seeders >= 1', True),
+    ('func_seeders >= 1 and func_upload_24h >= 1', False),
+    ('func_ratio >= 5 and func_upload_24h < 1', False),
+    ('not func_upload_24h >= 1', False),
+    ('not (func_ratio >= 5 and func_upload_24h >= 1)', True),
+    ('func_seeders >= 1 xor func_upload_24h >= 1', False),
+])
+def test_unavailable_metric(text, expected):
+    values = {'func_ratio': 1.0, 'func_seeders': 3, 'func_upload_24h': None}
+    for rule in compile_both(text):
+        assert rule(values.get) is expected
+
+
+def random_expression(rnd, depth):
+    if depth == 0 or rnd.random() < 0.3:
+        return '{} {} {}'.format(rnd.choice(sorted(METRICS)), rnd.choice(['>=', '<', '==', '!=']), rnd.randint(0, 3))
+    if rnd.random() < 0.2:
+        return 'not ({})'.format(random_expression(rnd, depth - 1))
+    gate = rnd.choice(['and', 'or', 'xor'])
+    return ' {} '.format(gate).join('({})'.format(random_expression(rnd, depth - 1))
+                                     for _ in range(rnd.randint(2, 4)))
+
+
+def test_cost_order_doesnt_change_result():
+    rnd = random.Random(7)
+    for _ in range(300):
+        text = random_expression(rnd, 3)
+        (source_order, cost_order) = compile_both(text)
+        for _ in range(20):
+            values = dict((m, rnd.choice([None, 0, 1, 2, 3])) for m in METRICS)
+            assert source_order(values.get) == cost_order(values.get), (text, values)
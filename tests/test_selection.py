@@ -0,0 +1,51 @@
+#
+# test_selection.py
+#
+# usage, from project root (needs the plugin's runtime deps, i.e. deluge, installed):
+#   $ python -m pytest tests
+#
+
+import heapq
+import random
+
+import pytest
+
+from autoremoveplus import selection
+from autoremoveplus.selection import eviction_candidates, eviction_order
+
+
+def sorted_order(items, key, keep):
+    """Removal order as produced by the full sort eviction_order() replaces"""
+    items = sorted(items, key=key)
+    return list(reversed(items[max(keep, 0):]))
+
+
+@pytest.fixture(params=['public', 'inverted'])
+def heap_impl(request, monkeypatch):
+    # cover both the python 3.14+ max-heap API & the fallback on older pythons:
+    if request.param == 'inverted':
+        monkeypatch.delattr(heapq, 'heapify_max', raising=False)
+    elif not hasattr(heapq, 'heapify_max'):
+        pytest.skip('heapq.heapify_max() needs python 3.14')
+    return request.param
+
+
+@pytest.mark.parametrize('keep', [0, 1, 50, 299, 300, 400, -5])
+def test_matches_sorted_w_ties(heap_impl, keep):
+    rnd = random.Random(keep)
+    # few distinct keys, so most of them tie:
+    items = [(i, (rnd.randint(0, 3), rnd.choice([0.5, 1.0]))) for i in range(300)]
+    key = lambda item: item[1]
+    assert list(eviction_candidates(items, key, keep)) == sorted_order(items, key, keep)
+
+
+def test_lazy_prefix(heap_impl):
+    keys = [5, 1, 5, 3, 5]
+    order = eviction_order(keys, 0)
+    assert [next(order), next(order), next(order)] == [4, 2, 0]
+
+
+def test_sort_value_none_last(heap_impl):
+    items = [('a', None), ('b', 1.0), ('c', -2.0), ('d', None)]
+    key = lambda item: selection.sort_value(item[1])
+    assert [i for i, v in eviction_candidates(items, key, 0)] == ['b', 'c', 'd', 'a']